@@ -1,29 +1,87 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import csv
 import time
 import math
+import json
+import heapq
+import random
+import shutil
+import hashlib
+import tempfile
+import sqlite3
 import argparse
-from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Optional, Tuple, DefaultDict
-from collections import defaultdict
+import asyncio
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple, DefaultDict, Callable, Iterator, AsyncIterator, NamedTuple, TypedDict
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from dateutil import parser as dtparse
-from urllib.parse import urlparse, quote as urlquote
+from urllib.parse import urlparse, urlencode, quote as urlquote
+from email.utils import parsedate_to_datetime
+
+try:
+    import aiohttp  # optional, only needed for --async
+except ImportError:
+    aiohttp = None
+
+try:
+    import numpy as np  # optional, vectorizes business-hours computation
+except ImportError:
+    np = None
+
+try:
+    import orjson  # optional, faster JSON decoding
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec  # optional, decodes MR pages into just the fields we read
+except ImportError:
+    msgspec = None
 
 # ------------------------------
 # Helpers
 # ------------------------------
 
+# Prefix marking a group (rather than a project) in --project-paths-file
+GROUP_PREFIX = "group:"
+
+# First GitLab version whose merge request API filters on merged_after /
+# merged_before. Older servers ignore the parameters, so the client-side
+# merged_at filter always stays in place.
+MERGED_FILTERS_MIN_VERSION = (17, 0)
+
+# Status codes GitLab answers with when an endpoint (or its ordering) does
+# not support keyset pagination; we then fall back to offset pagination.
+KEYSET_UNSUPPORTED_STATUSES = (400, 405)
+
 
 def iso_utc(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
 def parse_dt(s: str) -> datetime:
-    return dtparse.parse(s)
+    """
+    Parse a timestamp. GitLab's fixed ISO 8601 format goes through the fast
+    datetime.fromisoformat() (which before Python 3.11 rejects a 'Z' suffix);
+    anything else falls back to dateutil.
+    """
+    try:
+        return datetime.fromisoformat(s[:-1] + "+00:00" if s.endswith("Z") else s)
+    except ValueError:
+        return dtparse.parse(s)
 
 
 def parse_user_dt(s: str) -> datetime:
@@ -39,8 +97,8 @@ def parse_user_dt(s: str) -> datetime:
     return dt
 
 
-def next_link_from_headers(resp: requests.Response) -> Optional[str]:
-    link = resp.headers.get("Link")
+def next_link_from_headers(headers) -> Optional[str]:
+    link = headers.get("Link")
     if not link:
         return None
     # Link: <url>; rel="next", ...
@@ -52,41 +110,66 @@ def next_link_from_headers(resp: requests.Response) -> Optional[str]:
     return None
 
 
-def sleep_if_rate_limited(resp: requests.Response):
-    try:
-        remaining = int(resp.headers.get("RateLimit-Remaining", "1000"))
-        reset = int(resp.headers.get("RateLimit-Reset", "0"))  # unix ts
-        if remaining <= 1 and reset:
-            now = int(time.time())
-            to_sleep = max(0, reset - now) + 1
-            print(f"[rate-limit] Sleeping {to_sleep}s...", file=sys.stderr)
-            time.sleep(to_sleep)
-    except Exception:
-        pass
-
-
 def s_to_hours_days(seconds: float) -> Tuple[float, float]:
     hours = seconds / 3600.0
     days = hours / 24.0
     return round(hours, 2), round(days, 2)
 
 
-def percentile(sorted_values: List[float], p: float) -> float:
+# Below this many values a single sort beats NumPy's conversion overhead
+PARTITION_MIN_VALUES = 512
+
+
+def percentiles(values: List[float], ps: List[float]) -> List[float]:
     """
-    p in [0,1]. Uses linear interpolation between closest ranks.
+    Percentiles for several p in [0,1] at once on unsorted values, with
+    linear interpolation between closest ranks. Only the ranks the requested
+    percentiles interpolate between are selected (NumPy's introselect via
+    numpy.partition) instead of sorting everything; without NumPy, or for
+    small inputs, the values are sorted once.
     """
-    if not sorted_values:
-        return 0.0
-    if len(sorted_values) == 1:
-        return sorted_values[0]
-    k = (len(sorted_values) - 1) * p
-    f = math.floor(k)
-    c = math.ceil(k)
-    if f == c:
-        return sorted_values[int(k)]
-    d0 = sorted_values[f] * (c - k)
-    d1 = sorted_values[c] * (k - f)
-    return d0 + d1
+    if not values:
+        return [0.0 for _ in ps]
+    n = len(values)
+    ranks = [(n - 1) * p for p in ps]
+    needed = sorted({math.floor(k) for k in ranks} | {math.ceil(k) for k in ranks})
+    if np is not None and n >= PARTITION_MIN_VALUES:
+        selected = np.partition(np.asarray(values, dtype=np.float64), needed)
+        at = {i: float(selected[i]) for i in needed}
+    else:
+        ordered = sorted(values)
+        at = {i: ordered[i] for i in needed}
+
+    results = []
+    for k in ranks:
+        f = math.floor(k)
+        c = math.ceil(k)
+        results.append(at[f] if f == c else at[f] * (c - k) + at[c] * (k - f))
+    return results
+
+
+def parse_quantiles(s: str) -> List[float]:
+    """Parse '50,90,p99' (percent) into fractions [0.5, 0.9, 0.99]."""
+    qs = []
+    for item in s.split(","):
+        item = item.strip().lower().lstrip("p")
+        if not item:
+            continue
+        try:
+            q = float(item)
+        except ValueError:
+            raise ValueError(f"invalid quantile {item!r}")
+        if not 0 <= q <= 100:
+            raise ValueError(f"quantile {item!r} is not between 0 and 100")
+        qs.append(q / 100)
+    if not qs:
+        raise ValueError("no quantiles given")
+    return qs
+
+
+def quantile_label(q: float) -> str:
+    """0.5 -> 'p50', 0.999 -> 'p99.9'."""
+    return f"p{round(q * 100, 6):g}"
 
 
 def read_list_file(path: str) -> List[str]:
@@ -106,122 +189,2575 @@ def read_list_file(path: str) -> List[str]:
     return items
 
 
-def business_seconds_between(start: datetime, end: datetime) -> float:
+# ------------------------------
+# Business calendar
+# ------------------------------
+
+US = 1_000_000
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+WEEKDAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def epoch_us(dt: datetime) -> int:
+    """Exact UTC epoch time of an aware datetime, in microseconds."""
+    return (dt - UNIX_EPOCH) // timedelta(microseconds=1)
+
+
+def parse_epoch_us(s: str) -> int:
+    """Epoch microseconds of a timestamp string (UTC unless it has an offset)."""
+    dt = parse_dt(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return epoch_us(dt)
+
+
+def utc_from_epoch_us(t_us: int) -> datetime:
+    return UNIX_EPOCH + timedelta(microseconds=t_us)
+
+
+def iso_utc_us(t_us: int) -> str:
+    """Epoch microseconds in GitLab's timestamp format ('...T10:00:00.000Z')."""
+    dt = utc_from_epoch_us(t_us)
+    if dt.microsecond % 1000:
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def parse_business_hours(s: str) -> Tuple[dt_time, dt_time]:
+    """Parse 'HH:MM-HH:MM' into (start, end) wall-clock times."""
+    try:
+        start_s, end_s = s.split("-")
+        start = dt_time.fromisoformat(start_s.strip())
+        end = dt_time.fromisoformat(end_s.strip())
+    except ValueError:
+        raise ValueError(f"invalid business hours {s!r} (expected HH:MM-HH:MM)")
+    if end <= start:
+        raise ValueError(f"invalid business hours {s!r}: end must be after start")
+    return start, end
+
+
+def parse_weekend(s: str) -> List[int]:
+    """Parse a comma-separated list of day names ('sat,sun') into weekday numbers."""
+    days = []
+    for name in s.split(","):
+        name = name.strip().lower()[:3]
+        if not name:
+            continue
+        if name not in WEEKDAY_NAMES:
+            raise ValueError(f"invalid weekend day {name!r} (expected mon..sun)")
+        days.append(WEEKDAY_NAMES.index(name))
+    return days
+
+
+def read_holidays_file(path: str) -> List[date]:
+    """Read one YYYY-MM-DD holiday per line (read_list_file format)."""
+    holidays = []
+    for item in read_list_file(path):
+        try:
+            holidays.append(date.fromisoformat(item.split()[0]))
+        except ValueError:
+            raise ValueError(f"invalid holiday {item!r} in {path} (expected YYYY-MM-DD)")
+    return holidays
+
+
+class BusinessCalendar:
     """
-    Compute 'business seconds' between two datetimes:
-    - Only counts time between 09:00–17:00 UTC
-    - Only Monday–Friday (Mon=0, Sun=6)
+    Working time of one team: business hours in a timezone, weekend days and
+    holidays (default: Monday–Friday, 09:00–17:00 UTC).
+
+    Business durations are looked up in a per-day index covering the dates in
+    use: for every local day, its start and working hours as epoch
+    microseconds, plus the business time accumulated before it. Each timestamp
+    then costs one binary search, however rich the calendar is.
+    """
+
+    # Extra days indexed on each side when the index has to grow; it also
+    # grows by at least its current span, so repeated growth stays linear
+    INDEX_MARGIN_DAYS = 7
+
+    def __init__(
+        self,
+        tz: str = "UTC",
+        hours: str = "09:00-17:00",
+        weekend: str = "sat,sun",
+        holidays: Optional[List[date]] = None,
+    ):
+        if tz.upper() == "UTC":
+            self.tz = timezone.utc
+        else:
+            try:
+                self.tz = ZoneInfo(tz)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError(f"unknown timezone {tz!r}")
+        self.start, self.end = parse_business_hours(hours)
+        self.weekend = set(parse_weekend(weekend))
+        self.holidays = set(holidays or [])
+
+        self.first_day: Optional[date] = None
+        self.last_day: Optional[date] = None
+        self.day_start: List[int] = []
+        self.work_start: List[int] = []
+        self.work_end: List[int] = []
+        self.cumulative: List[int] = []
+        self.arrays = None  # NumPy copies of the index, built on demand
+
+    def local_date(self, t_us: int) -> date:
+        return utc_from_epoch_us(t_us).astimezone(self.tz).date()
+
+    def local_us(self, d: date, t: dt_time) -> int:
+        return epoch_us(datetime.combine(d, t, tzinfo=self.tz))
+
+    def index_days(self, first: date, last: date) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """Day starts, working starts/ends and working time of first..last."""
+        day_start, work_start, work_end, length = [], [], [], []
+        d = first
+        while d <= last:
+            start = self.local_us(d, dt_time(0))
+            if d.weekday() in self.weekend or d in self.holidays:
+                ws = we = start
+            else:
+                ws, we = self.local_us(d, self.start), self.local_us(d, self.end)
+            day_start.append(start)
+            work_start.append(ws)
+            work_end.append(we)
+            length.append(we - ws)
+            d += timedelta(days=1)
+        return day_start, work_start, work_end, length
+
+    def ensure(self, lo_us: int, hi_us: int):
+        """
+        Make sure the index covers every instant in [lo_us, hi_us], indexing
+        only the missing days before or after what is already covered.
+        """
+        lo, hi = self.local_date(lo_us), self.local_date(hi_us)
+        if self.first_day is not None and self.first_day <= lo and hi <= self.last_day:
+            return
+        margin = timedelta(days=self.INDEX_MARGIN_DAYS)
+        if self.first_day is None:
+            self.first_day, self.last_day = lo - margin, hi + margin
+            self.day_start, self.work_start, self.work_end, length = self.index_days(self.first_day, self.last_day)
+            self.cumulative = [0]
+            for n in length:
+                self.cumulative.append(self.cumulative[-1] + n)
+            self.arrays = None
+            return
+
+        grow = max(margin, self.last_day - self.first_day + timedelta(days=1))
+        if hi > self.last_day:
+            last = max(hi + margin, self.last_day + grow)
+            day_start, work_start, work_end, length = self.index_days(self.last_day + timedelta(days=1), last)
+            self.day_start += day_start
+            self.work_start += work_start
+            self.work_end += work_end
+            for n in length:
+                self.cumulative.append(self.cumulative[-1] + n)
+            self.last_day = last
+        if lo < self.first_day:
+            first = min(lo - margin, self.first_day - grow)
+            day_start, work_start, work_end, length = self.index_days(first, self.first_day - timedelta(days=1))
+            prefix = [0]
+            for n in length:
+                prefix.append(prefix[-1] + n)
+            # Business time is counted from the start of the index, so the
+            # days already indexed move by the time prepended before them
+            self.cumulative = prefix + [c + prefix[-1] for c in self.cumulative[1:]]
+            self.day_start = day_start + self.day_start
+            self.work_start = work_start + self.work_start
+            self.work_end = work_end + self.work_end
+            self.first_day = first
+        self.arrays = None
+
+    def business_us(self, t_us: int) -> int:
+        """Business time from the start of the index to t_us (call ensure() first)."""
+        i = bisect_right(self.day_start, t_us) - 1
+        ws = self.work_start[i]
+        return self.cumulative[i] + min(max(t_us, ws), self.work_end[i]) - ws
+
+    def business_us_array(self, t_us: "np.ndarray") -> "np.ndarray":
+        """business_us() over an int64 array."""
+        if self.arrays is None:
+            self.arrays = tuple(
+                np.asarray(a, dtype=np.int64)
+                for a in (self.day_start, self.work_start, self.work_end, self.cumulative)
+            )
+        day_start, work_start, work_end, cumulative = self.arrays
+        i = np.searchsorted(day_start, t_us, side="right") - 1
+        ws = work_start[i]
+        return cumulative[i] + np.clip(t_us, ws, work_end[i]) - ws
+
+    def durations(self, created_us: List[int], merged_us: List[int]) -> Tuple[List[float], List[float]]:
+        """
+        Raw and business durations in seconds for whole batches of
+        (created, merged) epoch-microsecond pairs. Vectorized with NumPy when
+        it is installed, otherwise computed one pair at a time.
+        """
+        if not created_us:
+            return [], []
+        self.ensure(min(created_us), max(merged_us))
+
+        if np is None:
+            raw = [(m - c) / US for c, m in zip(created_us, merged_us)]
+            business = [
+                (self.business_us(m) - self.business_us(c)) / US if m > c else 0.0
+                for c, m in zip(created_us, merged_us)
+            ]
+            return raw, business
+
+        created = np.asarray(created_us, dtype=np.int64)
+        merged = np.asarray(merged_us, dtype=np.int64)
+        business = np.where(merged > created, self.business_us_array(merged) - self.business_us_array(created), 0)
+        return ((merged - created) / US).tolist(), (business / US).tolist()
+
+
+DEFAULT_CALENDAR = BusinessCalendar()
+
+
+def business_seconds_between(start: datetime, end: datetime, calendar: Optional[BusinessCalendar] = None) -> float:
+    """
+    Compute 'business seconds' between two datetimes according to a
+    calendar (default: Monday–Friday, 09:00–17:00 UTC). The report uses
+    BusinessCalendar.durations() for whole projects; this scalar form is
+    kept for single intervals and is what tests/test_business_time.py
+    checks against the original day-by-day loop.
     """
     if end <= start:
         return 0.0
+    calendar = calendar or DEFAULT_CALENDAR
+    start_us, end_us = epoch_us(start), epoch_us(end)
+    calendar.ensure(start_us, end_us)
+    return (calendar.business_us(end_us) - calendar.business_us(start_us)) / US
+
+
+def load_team_calendars(path: str, defaults: dict) -> List[Tuple[str, BusinessCalendar]]:
+    """
+    Read per-team calendars from a JSON file mapping a project path prefix
+    (e.g. "acme/platform") to calendar settings:
+
+        {"acme/platform": {"timezone": "Europe/Berlin", "hours": "08:00-16:00",
+                           "weekend": "sat,sun", "holidays_file": "de.txt"}}
+
+    Settings not given fall back to `defaults` (the CLI values). Returns
+    (prefix, calendar) pairs, longest prefix first.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        teams = json.load(f)
+
+    calendars = []
+    for prefix, settings in teams.items():
+        opts = dict(defaults, **settings)
+        holidays = read_holidays_file(opts["holidays_file"]) if opts.get("holidays_file") else []
+        calendar = BusinessCalendar(opts["timezone"], opts["hours"], opts["weekend"], holidays)
+        calendars.append((prefix.strip("/"), calendar))
+    calendars.sort(key=lambda pc: len(pc[0]), reverse=True)
+    return calendars
+
+
+def calendar_for_project(
+    path_ns: str,
+    team_calendars: List[Tuple[str, BusinessCalendar]],
+    default: BusinessCalendar,
+) -> BusinessCalendar:
+    """Calendar of the longest team prefix matching a project path."""
+    for prefix, calendar in team_calendars:
+        if path_ns == prefix or path_ns.startswith(prefix + "/"):
+            return calendar
+    return default
+
+
+# ------------------------------
+# API
+# ------------------------------
+
+
+def parse_version(version: str) -> Tuple[int, ...]:
+    """'16.11.2-ee' -> (16, 11, 2)"""
+    parts = []
+    for part in version.split("-")[0].split("."):
+        if not part.isdigit():
+            break
+        parts.append(int(part))
+    return tuple(parts)
+
+
+# Server-side date bounds are widened to whole hours; the client-side window
+# check trims the extra MRs. A relative window (--days, no --until) then
+# sends the same query for an hour, so its pages can be revalidated from
+# the HTTP cache instead of being new URLs on every run.
+def query_lower_bound(dt: datetime) -> str:
+    return iso_utc(dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0))
+
+
+def query_upper_bound(dt: datetime) -> str:
+    """Strictly after dt, so MRs merged within its last second are kept."""
+    hour = dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return iso_utc(hour + timedelta(hours=1))
+
+
+def merged_mrs_params(
+    since_dt: datetime,
+    until_dt: Optional[datetime] = None,
+    merged_filters: bool = False,
+    include_subgroups: bool = False,
+) -> dict:
+    """
+    Query for merged MRs, narrowed server-side by updated_after (an MR is
+    updated when merged) and, when the server supports it, by merge date.
+    """
+    params = {
+        "state": "merged",
+        "per_page": 100,
+        "order_by": "updated_at",
+        "sort": "desc",
+        "updated_after": query_lower_bound(since_dt),
+        "scope": "all",
+    }
+    if merged_filters:
+        params["merged_after"] = query_lower_bound(since_dt)
+        if until_dt is not None:
+            params["merged_before"] = query_upper_bound(until_dt)
+    if include_subgroups:
+        params["include_subgroups"] = "true"
+    return params
+
+
+def keyset_params(params: dict) -> dict:
+    """Switch a list query to keyset pagination (GitLab requires id ordering)."""
+    return {**params, "pagination": "keyset", "order_by": "id", "sort": "desc"}
+
+
+def total_pages_from_headers(headers) -> int:
+    """
+    X-Total-Pages of a first offset page, or 0 if unknown (GitLab omits the
+    totals for very large result sets).
+    """
+    try:
+        if int(headers.get("X-Page") or 1) != 1:
+            return 0
+        return int(headers.get("X-Total-Pages") or 0)
+    except ValueError:
+        return 0
+
+
+def endpoint_key(url: str) -> str:
+    """'/api/v4/projects/123/merge_requests' -> '/api/v4/projects/:id/merge_requests'"""
+    return re.sub(r"/(projects|groups)/[^/]+/", r"/\1/:id/", urlparse(url).path)
+
+
+def log_merged_filters(version: str, supported: bool):
+    if supported:
+        print(f"[info] GitLab {version}: filtering merge requests by merge date server-side", file=sys.stderr)
+    else:
+        print(f"[info] GitLab {version}: no merge-date filters, narrowing by updated_at only", file=sys.stderr)
+
+
+def group_mrs_url(base_url: str, group_id_or_path: str) -> str:
+    if group_id_or_path.isdigit():
+        return f"{base_url}/api/v4/groups/{group_id_or_path}/merge_requests"
+    return f"{base_url}/api/v4/groups/{urlquote(group_id_or_path, safe='')}/merge_requests"
+
+
+def project_path_from_mr(mr: dict) -> str:
+    """
+    path_with_namespace of the project an MR belongs to, taken from the MR
+    itself ("group/project!12" reference, else its web_url) so group-level
+    listings need no extra project lookups.
+    """
+    full_ref = (mr.get("references") or {}).get("full") or ""
+    if "!" in full_ref:
+        return full_ref.rsplit("!", 1)[0]
+    web_url = mr.get("web_url") or ""
+    if web_url:
+        return extract_path_from_url_or_path(web_url)
+    return str(mr.get("project_id", ""))
+
+
+def decode_json(body):
+    """Decode a JSON response body (bytes or str), with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class AuthorPayload(TypedDict, total=False):
+    username: Optional[str]
+    name: Optional[str]
+
+
+class ReferencesPayload(TypedDict, total=False):
+    full: Optional[str]
+
+
+class MRPayload(TypedDict, total=False):
+    """The fields of an MR list item that MergedMR reads."""
+    project_id: Optional[int]
+    iid: int
+    title: Optional[str]
+    author: Optional[AuthorPayload]
+    created_at: Optional[str]
+    merged_at: Optional[str]
+    updated_at: Optional[str]
+    target_branch: Optional[str]
+    source_branch: Optional[str]
+    web_url: Optional[str]
+    references: Optional[ReferencesPayload]
+
+
+# msgspec skips every other field (descriptions, labels, users, ...) while
+# parsing, instead of building dicts that are dropped right away
+MR_PAGE_DECODER = msgspec.json.Decoder(List[MRPayload]) if msgspec is not None else None
+
+
+def decode_mr_page(body) -> Any:
+    """
+    Decode one page of an MR listing. With msgspec, items hold only the
+    MRPayload fields; anything else (e.g. an error object) is decoded as
+    plain JSON so callers can report it.
+    """
+    if MR_PAGE_DECODER is not None:
+        try:
+            return MR_PAGE_DECODER.decode(body)
+        except msgspec.ValidationError:
+            pass
+    return decode_json(body)
+
+
+class MergedMR:
+    """
+    A merged MR normalized once, when it enters the script: only the fields
+    the report uses, with timestamps pre-parsed to UTC epoch microseconds so
+    no later stage parses them again. Slotted, with repeated strings
+    (authors, branches, project paths) interned, since large backfills hold
+    hundreds of thousands of these; the API payload is dropped right away.
+    """
+
+    __slots__ = (
+        "project_id", "iid", "title", "author_username", "author_name", "created_us", "merged_us",
+        "updated_us", "target_branch", "source_branch", "web_url", "project_path",
+    )
+
+    def __init__(self, mr: dict, merged_us: int):
+        author = mr.get("author") or {}
+        self.project_id = mr.get("project_id")
+        self.iid = mr["iid"]
+        self.title = mr["title"]
+        self.author_username = intern_str(author.get("username"))
+        self.author_name = intern_str(author.get("name"))
+        self.created_us = parse_epoch_us(mr["created_at"])
+        self.merged_us = merged_us
+        self.updated_us = parse_epoch_us(mr["updated_at"]) if mr.get("updated_at") else None
+        self.target_branch = intern_str(mr.get("target_branch", ""))
+        self.source_branch = mr.get("source_branch", "")
+        self.web_url = mr.get("web_url", "")
+        self.project_path = intern_str(project_path_from_mr(mr))
+
+    @property
+    def created_at(self) -> str:
+        return iso_utc_us(self.created_us)
+
+    @property
+    def merged_at(self) -> str:
+        return iso_utc_us(self.merged_us)
+
+    @property
+    def updated_at(self) -> Optional[str]:
+        return iso_utc_us(self.updated_us) if self.updated_us is not None else None
+
+    def to_dict(self) -> dict:
+        """The MR in API shape, as kept in the --incremental state file."""
+        return {
+            "project_id": self.project_id,
+            "iid": self.iid,
+            "title": self.title,
+            "author": {"username": self.author_username, "name": self.author_name},
+            "created_at": self.created_at,
+            "merged_at": self.merged_at,
+            "updated_at": self.updated_at,
+            "target_branch": self.target_branch,
+            "source_branch": self.source_branch,
+            "web_url": self.web_url,
+            "references": {"full": f"{self.project_path}!{self.iid}"},
+        }
+
+
+def intern_str(s: Optional[str]) -> Optional[str]:
+    return sys.intern(s) if s else s
+
+
+def window_us(since_dt: datetime, until_dt: Optional[datetime]) -> Tuple[int, Optional[int]]:
+    return epoch_us(since_dt), (epoch_us(until_dt) if until_dt is not None else None)
+
+
+def merged_record(mr: dict, since_us: int, until_us: Optional[int]) -> Optional[MergedMR]:
+    """
+    Normalize one MR payload if it was merged within [since_us, until_us].
+    merged_at is parsed first so MRs outside the window cost a single parse.
+    """
+    merged_at = mr.get("merged_at")
+    if not merged_at:
+        return None
+    merged_us = parse_epoch_us(merged_at)
+    if merged_us < since_us or (until_us is not None and merged_us > until_us):
+        return None
+    return MergedMR(mr, merged_us)
+
+
+def merged_records(mrs, since_dt: datetime, until_dt: Optional[datetime]) -> List[MergedMR]:
+    """
+    Normalize MR payloads (any iterable of API-shaped dicts), keeping those
+    merged within [since_dt, until_dt]. Payloads are consumed one at a time,
+    so streamed pages are released as soon as they are converted.
+    """
+    since_us, until_us = window_us(since_dt, until_dt)
+    records = []
+    for mr in mrs:
+        record = merged_record(mr, since_us, until_us)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+class ListingCollector:
+    """
+    Accumulates the merged MRs of a paginated listing, recording them into a
+    checkpoint task (if any) whenever a page leaves a resumable cursor.
+    """
+
+    def __init__(self, since_dt: datetime, until_dt: Optional[datetime], task: Optional["CheckpointTask"]):
+        self.since_us, self.until_us = window_us(since_dt, until_dt)
+        self.task = task
+        self.records: List[MergedMR] = task.records(since_dt, until_dt) if task is not None else []
+        self.pending: List[MergedMR] = []  # not yet written to the checkpoint
+        self.done = task is not None and task.done
+        self.resume = (task.next_url, task.mode) if task is not None and task.next_url else None
+
+    def add_page(self, batch: List[dict], next_url: Optional[str], mode: str):
+        for mr in batch:
+            record = merged_record(mr, self.since_us, self.until_us)
+            if record is not None:
+                self.records.append(record)
+                self.pending.append(record)
+        if self.task is not None and next_url:
+            self.task.page(self.pending, next_url, mode)
+            self.pending = []
+
+    def finish(self) -> List[MergedMR]:
+        if self.task is not None and not self.done:
+            self.task.complete(self.pending)
+        return self.records
+
+
+class ProjectRegistry:
+    """
+    Resolved projects, keyed by id and by path. Both path resolution and
+    the fetch loop go through it, so each project's metadata is requested
+    at most once per run, and (with a cache file) not at all on later runs.
+    """
+
+    FIELDS = ("id", "path_with_namespace", "name", "namespace", "web_url")
+
+    def __init__(self):
+        self.by_id: Dict[str, dict] = {}
+        self.by_path: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, project_id_or_path: str) -> Optional[dict]:
+        with self.lock:
+            if project_id_or_path.isdigit():
+                return self.by_id.get(project_id_or_path)
+            pid = self.by_path.get(project_id_or_path.lower())
+            return self.by_id.get(pid) if pid else None
+
+    def add(self, proj: dict) -> dict:
+        """Store the fields we use from a /projects/:id payload and return them."""
+        entry = {k: proj[k] for k in self.FIELDS if k in proj}
+        entry["id"] = int(entry["id"])
+        namespace = entry.get("namespace")
+        if isinstance(namespace, dict):
+            entry["namespace"] = namespace.get("full_path", "")
+        with self.lock:
+            existing = self.by_id.get(str(entry["id"]))
+            if existing:
+                # Keep richer metadata when only a partial entry is added
+                entry = {**existing, **entry}
+            self.by_id[str(entry["id"])] = entry
+            if entry.get("path_with_namespace"):
+                self.by_path[entry["path_with_namespace"].lower()] = str(entry["id"])
+        return entry
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[warn] Ignoring unreadable project cache {path}: {e}", file=sys.stderr)
+            return
+        for entry in entries:
+            self.add(entry)
+
+    def save(self, path: str):
+        with self.lock:
+            entries = sorted(self.by_id.values(), key=lambda e: int(e["id"]))
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=1)
+        os.replace(tmp, path)
+
+
+class HttpCache:
+    """
+    On-disk cache of GET responses, keyed by token + URL + params. Entries
+    keep the body plus ETag / Last-Modified, requests are sent conditionally
+    and a 304 is served from disk. The directory is kept under `max_bytes`
+    by evicting least recently used entries.
+    """
+
+    # Eviction frees space down to this fraction of max_bytes, so a full
+    # cache is not re-scanned on every write
+    LOW_WATER = 0.9
+
+    # Response headers the pagination code reads back from a cached entry
+    KEPT_HEADERS = ("Content-Type", "Link", "X-Page", "X-Per-Page", "X-Total", "X-Total-Pages", "X-Next-Page")
+
+    def __init__(self, path: str, max_bytes: int, scope: str = ""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.scope = hashlib.sha256(scope.encode("utf-8")).hexdigest()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        self.size = sum(os.path.getsize(p) for p in self.entry_paths())
+
+    def entry_paths(self) -> List[str]:
+        return [os.path.join(self.path, n) for n in os.listdir(self.path) if n.endswith(".json")]
+
+    def key(self, url: str, params: dict = None) -> str:
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha256(f"{self.scope} {url} {query}".encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[dict]:
+        path = os.path.join(self.path, key + ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def store(self, key: str, headers, body: str):
+        """Cache a 200 response body, if the server sent a validator for it."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        entry = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "headers": {h: headers[h] for h in self.KEPT_HEADERS if h in headers},
+            "body": body,
+        }
+        path = os.path.join(self.path, key + ".json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            with self.lock:
+                old = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp, path)
+                self.size += os.path.getsize(path) - old
+                if self.size > self.max_bytes:
+                    self.evict()
+        except OSError as e:
+            print(f"[warn] Could not write cache entry: {e}", file=sys.stderr)
+
+    def evict(self):
+        """Drop least recently used entries until under LOW_WATER * max_bytes (lock held)."""
+        entries = []
+        for p in self.entry_paths():
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.LOW_WATER
+        for _, size, p in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(p)
+                self.size -= size
+            except OSError:
+                pass
+
+    def response(self, entry: dict, url: str) -> requests.Response:
+        """Rebuild a requests.Response from a cached entry."""
+        r = requests.Response()
+        r.status_code = 200
+        r.url = url
+        r.encoding = "utf-8"
+        r.headers = CaseInsensitiveDict(entry["headers"])
+        r._content = entry["body"].encode("utf-8")
+        return r
+
+    def summary(self) -> str:
+        with self.lock:
+            return f"Hits (304): {self.hits} | Misses: {self.misses} | Size: {self.size / 1e6:.1f} MB"
+
+
+class RequestBudgetExceeded(RuntimeError):
+    pass
+
+
+class RequestBudget:
+    """
+    Upper bound on the number of API requests a run may make, shared by all
+    clients and workers. Exceeding it aborts the run.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit  # 0 = unlimited
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def spend(self):
+        with self.lock:
+            if self.limit and self.used >= self.limit:
+                raise RequestBudgetExceeded(
+                    f"request budget of {self.limit} exhausted (raise --max-requests or narrow the run)"
+                )
+            self.used += 1
+
+
+class RateGovernor:
+    """
+    Client-side token bucket shared by every worker/task of a run, refilled
+    from GitLab's RateLimit-* headers on every response: the remaining quota
+    is spread evenly until RateLimit-Reset, with bursts of at most
+    BURST_FRACTION of it. An exhausted quota or a 429 (honouring
+    Retry-After) pauses all requests until the server allows more.
+    """
+
+    BURST_FRACTION = 0.1
+    # Pause after a 429 without Retry-After / RateLimit-Reset
+    DEFAULT_PAUSE = 60
+
+    def __init__(self):
+        self.rate = math.inf  # tokens per second; unlimited until GitLab reports a quota
+        self.capacity = math.inf
+        self.tokens = math.inf
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.warned = False
+        self.lock = threading.Lock()
+
+    def refill(self, now: float):
+        if self.rate != math.inf:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns how long to wait before sending the request."""
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 and self.rate > 0 else 0.0
+            return max(delay, self.paused_until - now)
+
+    def pause(self, seconds: float, reason: str):
+        with self.lock:
+            until = time.monotonic() + seconds
+            if until > self.paused_until:
+                print(f"[rate-limit] {reason}; pausing all requests for {seconds:.0f}s...", file=sys.stderr)
+                self.paused_until = until
+
+    def update(self, headers):
+        """Re-plan from the RateLimit-* headers of a response."""
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")  # unix ts
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset = int(remaining), int(reset)
+            limit = int(headers.get("RateLimit-Limit") or 0)
+        except ValueError:
+            if not self.warned:
+                self.warned = True
+                print(f"[warn] Ignoring unparsable RateLimit headers: remaining={remaining!r} reset={reset!r}",
+                      file=sys.stderr)
+            return
+        window = max(0.0, reset - time.time())
+        if remaining <= 1 and window > 0:
+            # Nothing to spread: wait for the new window, whose first
+            # responses re-plan the pacing.
+            self.pause(window + 1, f"quota exhausted ({remaining}/{limit or '?'} left)")
+            with self.lock:
+                self.rate = self.capacity = self.tokens = math.inf
+            return
+        with self.lock:
+            self.refill(time.monotonic())
+            self.capacity = max(1.0, remaining * self.BURST_FRACTION)
+            self.rate = remaining / window if window > 0 else math.inf
+            self.tokens = min(self.tokens, self.capacity)
+
+    def throttled(self, status: int, headers) -> bool:
+        """Pause on a 429 response; True if the request should be retried."""
+        if status != 429:
+            return False
+        self.pause(retry_after_seconds(headers, self.DEFAULT_PAUSE), "429 Too Many Requests")
+        return True
+
+
+def retry_after_seconds(headers, default: float) -> float:
+    """Seconds from Retry-After (delta or HTTP date), else RateLimit-Reset, else default."""
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    reset = headers.get("RateLimit-Reset")
+    if reset and reset.isdigit():
+        return max(0.0, int(reset) - time.time()) + 1
+    return default
+
+
+class RetryPolicy:
+    """
+    Retries for transient failures of a single GET (5xx gateway/server
+    errors, connection errors, timeouts) with exponential backoff and full
+    jitter. Retrying the one request keeps the pages already fetched, so a
+    listing resumes where it failed instead of the project being dropped.
+    """
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+
+    def __init__(self, attempts: int = 3, backoff: float = 1.0, max_backoff: float = 30.0):
+        self.attempts = attempts  # retries after the first try; 0 = never retry
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt: int, url: str, reason: str) -> float:
+        """Log retry number attempt+1 and return how long to wait before it."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        print(f"[retry] GET {url} failed ({reason}); retry {attempt + 1}/{self.attempts} in {delay:.1f}s",
+              file=sys.stderr)
+        return delay
+
+
+class PageStats:
+    """Latency of every list page fetched, per pagination mode."""
 
-    # Normalize to UTC
-    start = start.astimezone(timezone.utc)
-    end = end.astimezone(timezone.utc)
-
-    total = 0.0
-    current_date = start.date()
-    end_date = end.date()
-
-    # With the 30-day guard this will at most iterate ~31 days → cheap enough
-    while current_date <= end_date:
-        # Skip weekends
-        if current_date.weekday() < 5:  # 0-4 => Mon-Fri
-            day_start = datetime(
-                current_date.year,
-                current_date.month,
-                current_date.day,
-                9,
-                0,
-                tzinfo=timezone.utc,
+    def __init__(self):
+        self.latencies: DefaultDict[str, List[float]] = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def record(self, mode: str, seconds: float):
+        with self.lock:
+            self.latencies[mode].append(seconds)
+
+    def summary(self) -> str:
+        parts = []
+        with self.lock:
+            for mode, values in sorted(self.latencies.items()):
+                p50, p90 = percentiles(values, [0.5, 0.9])
+                parts.append(
+                    f"{mode}: {len(values)} pages | Avg: {sum(values) / len(values):.3f}s | "
+                    f"P50: {p50:.3f}s | P90: {p90:.3f}s | Max: {max(values):.3f}s"
+                )
+        return " || ".join(parts) if parts else "No pages fetched."
+
+
+class GitLab:
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        pool_size: int = 10,
+        registry: Optional[ProjectRegistry] = None,
+        keyset: bool = False,
+        prefetch_pages: int = 0,
+        cache: Optional[HttpCache] = None,
+        budget: Optional[RequestBudget] = None,
+        governor: Optional[RateGovernor] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.registry = registry if registry is not None else ProjectRegistry()
+        self.cache = cache
+        self.budget = budget if budget is not None else RequestBudget(0)
+        self.governor = governor if governor is not None else RateGovernor()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.keyset = keyset
+        self.keyset_unsupported = set()
+        self.prefetch_pages = prefetch_pages
+        self.page_stats = PageStats()
+        self.merged_filters: Optional[bool] = None
+        self.probe_lock = threading.Lock()
+        self.sess = requests.Session()
+        self.sess.headers.update({"PRIVATE-TOKEN": token})
+        # The session is shared by all fetch workers; size the connection
+        # pool so concurrent requests don't discard pooled connections.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.sess.mount("https://", adapter)
+        self.sess.mount("http://", adapter)
+
+    def send(self, method: str, url: str, **kwargs) -> Tuple[requests.Response, float]:
+        """
+        Issue one API request through the rate governor, request budget and
+        retry policy; returns the final response and when its attempt started.
+        """
+        attempt = 0
+        while True:
+            delay = self.governor.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            self.budget.spend()
+            started = time.monotonic()
+            try:
+                r = self.sess.request(method, url, timeout=60, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retry.attempts:
+                    raise
+                time.sleep(self.retry.delay(attempt, url, type(e).__name__))
+                attempt += 1
+                continue
+            self.governor.update(r.headers)
+            if self.governor.throttled(r.status_code, r.headers):
+                continue
+            if r.status_code in RetryPolicy.RETRY_STATUSES and attempt < self.retry.attempts:
+                time.sleep(self.retry.delay(attempt, url, f"HTTP {r.status_code}"))
+                attempt += 1
+                continue
+            return r, started
+
+    def get(self, url: str, params: dict = None, pagination: Optional[str] = None) -> requests.Response:
+        """GET a URL; list pages pass `pagination` to have their latency recorded."""
+        entry = key = None
+        if self.cache is not None:
+            key = self.cache.key(url, params)
+            entry = self.cache.load(key)
+        r, started = self.send("GET", url, params=params, headers=HttpCache.conditional_headers(entry))
+        if r.status_code == 304 and entry is not None:
+            self.cache.record(hit=True)
+            r = self.cache.response(entry, r.url)
+        else:
+            r.raise_for_status()
+            if self.cache is not None:
+                self.cache.record(hit=False)
+                self.cache.store(key, r.headers, r.text)
+        if pagination:
+            self.page_stats.record(pagination, time.monotonic() - started)
+        return r
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        """
+        POST a query to /api/graphql and return its "data". Queries are
+        read-only, so they are retried like GETs; they bypass the HTTP cache.
+        Field-level errors leave the affected fields null and are logged.
+        """
+        r, started = self.send("POST", f"{self.base_url}/api/graphql",
+                               json={"query": query, "variables": variables})
+        r.raise_for_status()
+        self.page_stats.record("graphql", time.monotonic() - started)
+        payload = decode_json(r.content)
+        errors = payload.get("errors") or []
+        if payload.get("data") is None:
+            raise RuntimeError(errors[0].get("message", "GraphQL error") if errors else "GraphQL response without data")
+        for error in errors:
+            print(f"[warn] GraphQL: {error.get('message')}", file=sys.stderr)
+        return payload["data"]
+
+    def first_page(self, url: str, params: dict) -> Tuple[requests.Response, str]:
+        """
+        Request the first page of a list, using keyset pagination if enabled
+        and not already known to be unsupported by this endpoint, otherwise
+        offset pagination. Returns (response, pagination mode).
+        """
+        key = endpoint_key(url)
+        if self.keyset and key not in self.keyset_unsupported:
+            try:
+                return self.get(url, params=keyset_params(params), pagination="keyset"), "keyset"
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code not in KEYSET_UNSUPPORTED_STATUSES:
+                    raise
+                self.keyset_unsupported.add(key)
+                print(f"[info] Keyset pagination not supported for {key}; using offset pagination",
+                      file=sys.stderr)
+        return self.get(url, params=params, pagination="offset"), "offset"
+
+    def iter_pages(
+        self,
+        url: str,
+        params: dict = None,
+        resume: Optional[Tuple[str, str]] = None,
+        decode: Callable[[bytes], Any] = decode_json,
+    ) -> Iterator[Tuple[List[dict], Optional[str], str]]:
+        """
+        Yield (items, next page URL, pagination mode) page by page, following
+        Link: rel="next". The next page URL is None on the last page and for
+        prefetched pages; otherwise listing can later continue from it by
+        passing resume=(next page URL, mode). Page bodies are decoded with
+        `decode` (decode_mr_page for MR listings).
+        """
+        params = dict(params or {})
+        if resume is not None:
+            nxt, mode = resume
+            r = self.get(nxt, pagination=mode)
+        else:
+            r, mode = self.first_page(url, params)
+            total_pages = total_pages_from_headers(r.headers) if mode == "offset" else 0
+            if self.prefetch_pages > 0 and total_pages > 1:
+                for batch in self.iter_prefetched(url, params, r, total_pages, decode):
+                    yield batch, None, mode
+                return
+        while True:
+            batch = decode(r.content)
+            if not isinstance(batch, list):
+                raise RuntimeError(f"Expected list from {url}")
+            nxt = next_link_from_headers(r.headers)
+            yield batch, nxt, mode
+            if not nxt:
+                break
+            r = self.get(nxt, pagination=mode)
+
+    def iter_prefetched(
+        self,
+        url: str,
+        params: dict,
+        first: requests.Response,
+        total_pages: int,
+        decode: Callable[[bytes], Any] = decode_json,
+    ) -> Iterator[List[dict]]:
+        """
+        Fetch pages 2..total_pages concurrently, at most `prefetch_pages`
+        ahead of the page being consumed, and yield them in order.
+        """
+        batch = decode(first.content)
+        if not isinstance(batch, list):
+            raise RuntimeError(f"Expected list from {url}")
+        yield batch
+        with ThreadPoolExecutor(max_workers=self.prefetch_pages) as pool:
+            pending = deque()
+            next_page = 2
+            while next_page <= total_pages or pending:
+                while next_page <= total_pages and len(pending) < self.prefetch_pages:
+                    page_params = {**params, "page": next_page}
+                    pending.append(pool.submit(self.get, url, page_params, "offset"))
+                    next_page += 1
+                batch = decode(pending.popleft().result().content)
+                if not isinstance(batch, list):
+                    raise RuntimeError(f"Expected list from {url}")
+                yield batch
+
+    def supports_merged_filters(self) -> bool:
+        """
+        Whether the instance filters MRs by merge date. Probed once via
+        /version; if the probe fails we assume it does not.
+        """
+        with self.probe_lock:
+            if self.merged_filters is None:
+                try:
+                    version = self.get(f"{self.base_url}/api/v4/version").json().get("version", "")
+                    self.merged_filters = parse_version(version) >= MERGED_FILTERS_MIN_VERSION
+                except RequestBudgetExceeded:
+                    raise
+                except Exception as e:
+                    print(f"[warn] Could not read GitLab version: {e}", file=sys.stderr)
+                    version = "unknown"
+                    self.merged_filters = False
+                log_merged_filters(version, self.merged_filters)
+            return self.merged_filters
+
+    def project(self, project_id_or_path: str) -> dict:
+        """
+        Project metadata (the ProjectRegistry.FIELDS subset), looked up in
+        the registry first and requested from the API only once.
+        """
+        cached = self.registry.lookup(project_id_or_path)
+        if cached:
+            return cached
+        # Accepts numeric id or path; path must be URL-encoded
+        if project_id_or_path.isdigit():
+            url = f"{self.base_url}/api/v4/projects/{project_id_or_path}"
+        else:
+            url = f"{self.base_url}/api/v4/projects/{urlquote(project_id_or_path, safe='')}"
+        return self.registry.add(self.get(url).json())
+
+    def merged_listing(
+        self,
+        url: str,
+        params: dict,
+        since_dt: datetime,
+        until_dt: Optional[datetime],
+        task: Optional["CheckpointTask"],
+    ) -> List[MergedMR]:
+        """Collect a merged-MR listing, checkpointing it page by page into `task`."""
+        collector = ListingCollector(since_dt, until_dt, task)
+        if not collector.done:
+            pages = self.iter_pages(url, params, collector.resume, decode_mr_page)
+            for batch, nxt, mode in pages:
+                collector.add_page(batch, nxt, mode)
+        return collector.finish()
+
+    def merged_mrs_since(
+        self,
+        project_id: str,
+        since_dt: datetime,
+        until_dt: Optional[datetime] = None,
+        task: Optional["CheckpointTask"] = None,
+    ) -> List[MergedMR]:
+        """
+        Use state=merged + updated_after (+ merged_after/merged_before when
+        supported) for server-side narrowing, then strictly filter by
+        since_dt <= merged_at <= until_dt client-side while streaming pages.
+        updated_after already ends pagination at the cutoff, since the
+        server returns no MR last updated before it. With a checkpoint task, progress is recorded after every
+        page and a resumed task continues from its last page.
+        """
+        url = f"{self.base_url}/api/v4/projects/{project_id}/merge_requests"
+        params = merged_mrs_params(since_dt, until_dt, self.supports_merged_filters())
+        return self.merged_listing(url, params, since_dt, until_dt, task)
+
+    def group_merged_mrs_since(
+        self,
+        group_id_or_path: str,
+        since_dt: datetime,
+        until_dt: Optional[datetime] = None,
+        task: Optional["CheckpointTask"] = None,
+    ) -> List[MergedMR]:
+        """
+        Same as merged_mrs_since, but for every project of a group (including
+        subgroups) in a single paginated stream.
+        """
+        url = group_mrs_url(self.base_url, group_id_or_path)
+        params = merged_mrs_params(since_dt, until_dt, self.supports_merged_filters(), include_subgroups=True)
+        return self.merged_listing(url, params, since_dt, until_dt, task)
+
+
+class AsyncGitLab:
+    """
+    asyncio counterpart of GitLab (same project / merged_mrs_since surface,
+    as coroutines). All requests share one aiohttp session and at most
+    `max_concurrency` are in flight at once, paced by the shared
+    RateGovernor.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        max_concurrency: int = 100,
+        registry: Optional[ProjectRegistry] = None,
+        keyset: bool = False,
+        prefetch_pages: int = 0,
+        cache: Optional[HttpCache] = None,
+        budget: Optional[RequestBudget] = None,
+        governor: Optional[RateGovernor] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        if aiohttp is None:
+            raise RuntimeError("The asyncio client requires aiohttp (pip install aiohttp).")
+        self.base_url = base_url.rstrip("/")
+        self.registry = registry if registry is not None else ProjectRegistry()
+        self.cache = cache
+        self.budget = budget if budget is not None else RequestBudget(0)
+        self.governor = governor if governor is not None else RateGovernor()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.keyset = keyset
+        self.keyset_unsupported = set()
+        self.prefetch_pages = prefetch_pages
+        self.page_stats = PageStats()
+        self.token = token
+        self.max_concurrency = max_concurrency
+        self.sess: Optional["aiohttp.ClientSession"] = None
+        self.sem: Optional[asyncio.Semaphore] = None
+        self.merged_filters: Optional[bool] = None
+        self.probe_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> "AsyncGitLab":
+        self.sem = asyncio.Semaphore(self.max_concurrency)
+        self.probe_lock = asyncio.Lock()
+        self.sess = aiohttp.ClientSession(
+            headers={"PRIVATE-TOKEN": self.token},
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.sess.close()
+
+    async def get(
+        self,
+        url: str,
+        params: dict = None,
+        pagination: Optional[str] = None,
+        decode: Callable[[str], Any] = decode_json,
+    ) -> Tuple[Any, CaseInsensitiveDict]:
+        """Returns (body decoded with `decode`, response headers)."""
+        entry = key = None
+        if self.cache is not None:
+            key = self.cache.key(url, params)
+            entry = self.cache.load(key)
+        async with self.sem:
+            attempt = 0
+            while True:
+                delay = self.governor.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.budget.spend()
+                started = time.monotonic()
+                retry_reason = None
+                try:
+                    async with self.sess.get(url, params=params, headers=HttpCache.conditional_headers(entry)) as r:
+                        headers = CaseInsensitiveDict(r.headers)
+                        self.governor.update(headers)
+                        if self.governor.throttled(r.status, headers):
+                            continue
+                        if r.status in RetryPolicy.RETRY_STATUSES and attempt < self.retry.attempts:
+                            retry_reason = f"HTTP {r.status}"
+                        elif r.status == 304 and entry is not None:
+                            self.cache.record(hit=True)
+                            body = entry["body"]
+                            headers.update(entry["headers"])
+                        else:
+                            r.raise_for_status()
+                            body = await r.text()
+                            if self.cache is not None:
+                                self.cache.record(hit=False)
+                                self.cache.store(key, headers, body)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt >= self.retry.attempts:
+                        raise
+                    retry_reason = type(e).__name__
+                if retry_reason is None:
+                    break
+                await asyncio.sleep(self.retry.delay(attempt, url, retry_reason))
+                attempt += 1
+            data = decode(body)
+            if pagination:
+                self.page_stats.record(pagination, time.monotonic() - started)
+        return data, headers
+
+    async def first_page(
+        self,
+        url: str,
+        params: dict,
+        decode: Callable[[str], Any] = decode_json,
+    ) -> Tuple[Any, CaseInsensitiveDict, str]:
+        key = endpoint_key(url)
+        if self.keyset and key not in self.keyset_unsupported:
+            try:
+                batch, headers = await self.get(url, params=keyset_params(params), pagination="keyset",
+                                                decode=decode)
+                return batch, headers, "keyset"
+            except aiohttp.ClientResponseError as e:
+                if e.status not in KEYSET_UNSUPPORTED_STATUSES:
+                    raise
+                if key not in self.keyset_unsupported:
+                    self.keyset_unsupported.add(key)
+                    print(f"[info] Keyset pagination not supported for {key}; using offset pagination",
+                          file=sys.stderr)
+        batch, headers = await self.get(url, params=params, pagination="offset", decode=decode)
+        return batch, headers, "offset"
+
+    async def iter_pages(
+        self,
+        url: str,
+        params: dict = None,
+        resume: Optional[Tuple[str, str]] = None,
+        decode: Callable[[str], Any] = decode_json,
+    ) -> AsyncIterator[Tuple[List[dict], Optional[str], str]]:
+        params = dict(params or {})
+        if resume is not None:
+            nxt, mode = resume
+            batch, headers = await self.get(nxt, pagination=mode, decode=decode)
+        else:
+            batch, headers, mode = await self.first_page(url, params, decode)
+            total_pages = total_pages_from_headers(headers) if mode == "offset" else 0
+            if self.prefetch_pages > 0 and total_pages > 1:
+                async for batch in self.iter_prefetched(url, params, batch, total_pages, decode):
+                    yield batch, None, mode
+                return
+        while True:
+            if not isinstance(batch, list):
+                raise RuntimeError(f"Expected list from {url}")
+            nxt = next_link_from_headers(headers)
+            yield batch, nxt, mode
+            if not nxt:
+                break
+            batch, headers = await self.get(nxt, pagination=mode, decode=decode)
+
+    async def iter_prefetched(
+        self,
+        url: str,
+        params: dict,
+        batch: Any,
+        total_pages: int,
+        decode: Callable[[str], Any] = decode_json,
+    ) -> AsyncIterator[List[dict]]:
+        pending = deque()
+        next_page = 2
+        try:
+            while True:
+                if not isinstance(batch, list):
+                    raise RuntimeError(f"Expected list from {url}")
+                yield batch
+                while next_page <= total_pages and len(pending) < self.prefetch_pages:
+                    page_params = {**params, "page": next_page}
+                    pending.append(asyncio.ensure_future(
+                        self.get(url, params=page_params, pagination="offset", decode=decode)))
+                    next_page += 1
+                if not pending:
+                    return
+                batch, _ = await pending.popleft()
+        finally:
+            for task in pending:
+                if task.done():
+                    task.exception()  # already failed or finished; mark as retrieved
+                else:
+                    task.cancel()
+
+    async def supports_merged_filters(self) -> bool:
+        async with self.probe_lock:
+            if self.merged_filters is None:
+                try:
+                    data, _ = await self.get(f"{self.base_url}/api/v4/version")
+                    version = data.get("version", "")
+                    self.merged_filters = parse_version(version) >= MERGED_FILTERS_MIN_VERSION
+                except RequestBudgetExceeded:
+                    raise
+                except Exception as e:
+                    print(f"[warn] Could not read GitLab version: {e}", file=sys.stderr)
+                    version = "unknown"
+                    self.merged_filters = False
+                log_merged_filters(version, self.merged_filters)
+            return self.merged_filters
+
+    async def project(self, project_id_or_path: str) -> dict:
+        cached = self.registry.lookup(project_id_or_path)
+        if cached:
+            return cached
+        if project_id_or_path.isdigit():
+            url = f"{self.base_url}/api/v4/projects/{project_id_or_path}"
+        else:
+            url = f"{self.base_url}/api/v4/projects/{urlquote(project_id_or_path, safe='')}"
+        data, _ = await self.get(url)
+        return self.registry.add(data)
+
+    async def merged_listing(
+        self,
+        url: str,
+        params: dict,
+        since_dt: datetime,
+        until_dt: Optional[datetime],
+        task: Optional["CheckpointTask"],
+    ) -> List[MergedMR]:
+        collector = ListingCollector(since_dt, until_dt, task)
+        if not collector.done:
+            pages = self.iter_pages(url, params, collector.resume, decode_mr_page)
+            async for batch, nxt, mode in pages:
+                collector.add_page(batch, nxt, mode)
+        return collector.finish()
+
+    async def merged_mrs_since(
+        self,
+        project_id: str,
+        since_dt: datetime,
+        until_dt: Optional[datetime] = None,
+        task: Optional["CheckpointTask"] = None,
+    ) -> List[MergedMR]:
+        url = f"{self.base_url}/api/v4/projects/{project_id}/merge_requests"
+        params = merged_mrs_params(since_dt, until_dt, await self.supports_merged_filters())
+        return await self.merged_listing(url, params, since_dt, until_dt, task)
+
+    async def group_merged_mrs_since(
+        self,
+        group_id_or_path: str,
+        since_dt: datetime,
+        until_dt: Optional[datetime] = None,
+        task: Optional["CheckpointTask"] = None,
+    ) -> List[MergedMR]:
+        url = group_mrs_url(self.base_url, group_id_or_path)
+        params = merged_mrs_params(
+            since_dt, until_dt, await self.supports_merged_filters(), include_subgroups=True,
+        )
+        return await self.merged_listing(url, params, since_dt, until_dt, task)
+
+
+# ------------------------------
+# Incremental sync state
+# ------------------------------
+
+
+class SyncState:
+    """
+    What previous --incremental runs already fetched. For every project and
+    group it keeps the start of the range covered so far ("since"), the
+    highest updated_at seen ("high_water") and, per project, the MRs
+    ingested. A later run only asks GitLab for MRs updated after the high
+    water mark and reports from the merged dataset.
+    """
+
+    # Re-read a little before the high water mark in case of MRs updated
+    # in the same second or replication lag on the GitLab side.
+    OVERLAP = timedelta(minutes=5)
+
+    def __init__(self):
+        self.projects: Dict[str, dict] = {}
+        self.groups: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        self.projects = data.get("projects", {})
+        self.groups = data.get("groups", {})
+
+    def save(self, path: str):
+        with self.lock:
+            data = {"projects": self.projects, "groups": self.groups}
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+
+    def fetch_since(self, entry: Optional[dict], since_dt: datetime) -> datetime:
+        """Where to start fetching, given the stored entry of a project/group."""
+        if entry and entry.get("since") and entry.get("high_water") and parse_dt(entry["since"]) <= since_dt:
+            return max(since_dt, parse_dt(entry["high_water"]) - self.OVERLAP)
+        return since_dt
+
+    def project_fetch_since(self, pid: str, since_dt: datetime) -> datetime:
+        with self.lock:
+            return self.fetch_since(self.projects.get(pid), since_dt)
+
+    def group_fetch_since(self, group: str, since_dt: datetime) -> datetime:
+        with self.lock:
+            return self.fetch_since(self.groups.get(group), since_dt)
+
+    @staticmethod
+    def advance(entry: dict, mrs: List[MergedMR], since_dt: datetime):
+        """Extend the covered range of an entry after fetching from since_dt on."""
+        if not entry.get("since") or parse_dt(entry["since"]) > since_dt:
+            entry["since"] = iso_utc(since_dt)
+        high_water_us = parse_epoch_us(entry["high_water"]) if entry.get("high_water") else None
+        for mr in mrs:
+            if mr.updated_us is not None and (high_water_us is None or mr.updated_us > high_water_us):
+                entry["high_water"], high_water_us = mr.updated_at, mr.updated_us
+
+    def ingest(self, pid: str, path_ns: str, mrs: List[MergedMR]) -> dict:
+        """Merge MRs into a project's dataset (lock held)."""
+        entry = self.projects.setdefault(pid, {"path": path_ns, "mrs": {}})
+        entry["path"] = path_ns
+        for mr in mrs:
+            entry["mrs"][str(mr.iid)] = mr.to_dict()
+        return entry
+
+    def record_project(
+        self,
+        pid: str,
+        path_ns: str,
+        mrs: List[MergedMR],
+        since_dt: datetime,
+        until_dt: datetime,
+    ) -> List[MergedMR]:
+        """
+        Store MRs fetched for a project from since_dt on and return the
+        stored MRs merged within [since_dt, until_dt].
+        """
+        with self.lock:
+            entry = self.ingest(pid, path_ns, mrs)
+            self.advance(entry, mrs, since_dt)
+            return merged_records(entry["mrs"].values(), since_dt, until_dt)
+
+    def record_group(
+        self,
+        group: str,
+        mrs: List[MergedMR],
+        since_dt: datetime,
+        until_dt: datetime,
+    ) -> List[MergedMR]:
+        """Same as record_project(), for a group-level listing."""
+        with self.lock:
+            entry = self.groups.setdefault(group, {"projects": []})
+            projects = set(entry["projects"])
+            for pid, (path_ns, project_mrs) in bucket_mrs_by_project([mrs]).items():
+                self.ingest(pid, path_ns, project_mrs)
+                projects.add(pid)
+            entry["projects"] = sorted(projects, key=int)
+            self.advance(entry, mrs, since_dt)
+            return merged_records(
+                (mr for pid in entry["projects"] for mr in self.projects[pid]["mrs"].values()),
+                since_dt, until_dt,
             )
-            day_end = datetime(
-                current_date.year,
-                current_date.month,
-                current_date.day,
-                17,
-                0,
-                tzinfo=timezone.utc,
+
+
+# ------------------------------
+# SQLite MR store
+# ------------------------------
+
+
+class MRStore:
+    """
+    Embedded SQLite database of merged MRs. Fetched MRs are upserted by
+    (project_id, iid), and reports for any window can be produced from it
+    without touching the API (--offline).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS merge_requests (
+            project_id INTEGER NOT NULL,
+            iid INTEGER NOT NULL,
+            project_path TEXT NOT NULL,
+            title TEXT NOT NULL,
+            author_username TEXT,
+            author_name TEXT,
+            created_at TEXT NOT NULL,
+            merged_at TEXT NOT NULL,
+            merged_ts REAL NOT NULL,
+            updated_at TEXT,
+            target_branch TEXT,
+            source_branch TEXT,
+            web_url TEXT,
+            PRIMARY KEY (project_id, iid)
+        );
+        CREATE INDEX IF NOT EXISTS mr_project_id ON merge_requests (project_id);
+        CREATE INDEX IF NOT EXISTS mr_merged_ts ON merge_requests (merged_ts);
+        CREATE INDEX IF NOT EXISTS mr_author ON merge_requests (author_username);
+    """
+
+    COLUMNS = (
+        "project_id", "iid", "project_path", "title", "author_username", "author_name",
+        "created_at", "merged_at", "merged_ts", "updated_at", "target_branch", "source_branch", "web_url",
+    )
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def upsert(self, pid: str, path_ns: str, mrs: List[MergedMR]):
+        records = []
+        for mr in mrs:
+            records.append((
+                int(pid), mr.iid, path_ns, mr.title, mr.author_username, mr.author_name,
+                mr.created_at, mr.merged_at, mr.merged_us / US, mr.updated_at,
+                mr.target_branch, mr.source_branch, mr.web_url,
+            ))
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO merge_requests ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                records,
             )
 
-            interval_start = max(start, day_start)
-            interval_end = min(end, day_end)
+    def query(
+        self,
+        since_dt: datetime,
+        until_dt: datetime,
+        project_ids: List[str],
+        project_paths: List[str],
+        group_paths: List[str],
+    ) -> List[Tuple[str, Optional[Tuple[str, List[MergedMR]]]]]:
+        """
+        MRs merged within the window, as (project_id, (path, mrs)) pairs
+        sorted by project id (the shape fetch_all() returns). Projects are
+        selected by id, path or group path prefix; no selection means all.
+        """
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM merge_requests WHERE merged_ts BETWEEN ? AND ?"
+        args: List[Any] = [since_dt.timestamp(), until_dt.timestamp()]
+        selectors = []
+        for pid in project_ids:
+            selectors.append("project_id = ?")
+            args.append(int(pid))
+        for path in project_paths:
+            selectors.append("project_path = ?")
+            args.append(path)
+        for group in group_paths:
+            selectors.append("substr(project_path, 1, ?) = ?")
+            args.extend([len(group) + 1, group + "/"])
+        if selectors:
+            sql += " AND (" + " OR ".join(selectors) + ")"
+        sql += " ORDER BY project_id, merged_ts DESC"
+
+        by_project: Dict[str, Tuple[str, List[MergedMR]]] = {}
+        for row in self.conn.execute(sql, args):
+            rec = dict(zip(self.COLUMNS, row))
+            pid = str(rec["project_id"])
+            if pid not in by_project:
+                by_project[pid] = (rec["project_path"], [])
+            by_project[pid][1].append(MergedMR({
+                "project_id": rec["project_id"],
+                "iid": rec["iid"],
+                "title": rec["title"],
+                "author": {"username": rec["author_username"], "name": rec["author_name"]},
+                "created_at": rec["created_at"],
+                "merged_at": rec["merged_at"],
+                "updated_at": rec["updated_at"],
+                "target_branch": rec["target_branch"],
+                "source_branch": rec["source_branch"],
+                "web_url": rec["web_url"],
+            }, parse_epoch_us(rec["merged_at"])))
+        return sorted(by_project.items(), key=lambda item: int(item[0]))
+
+    def close(self):
+        self.conn.close()
+
+
+# ------------------------------
+# Checkpoints
+# ------------------------------
+
+
+class CheckpointTask:
+    """
+    Progress of one merged-MR listing (a project or group, for one window
+    shard): the MRs recorded so far, where to continue (next page URL and
+    pagination mode) and whether the listing completed.
+    """
+
+    def __init__(self, checkpoint: "Checkpoint", key: str):
+        self.checkpoint = checkpoint
+        self.key = key
+        self.path: Optional[str] = None
+        self.mrs: List[dict] = []
+        self.next_url: Optional[str] = None
+        self.mode: Optional[str] = None
+        self.done = False
+
+    def records(self, since_dt: datetime, until_dt: Optional[datetime]) -> List[MergedMR]:
+        return merged_records(self.mrs, since_dt, until_dt)
+
+    def page(self, mrs: List[MergedMR], next_url: str, mode: str):
+        self.checkpoint.write({"task": self.key, "path": self.path, "mrs": [mr.to_dict() for mr in mrs],
+                               "next": next_url, "mode": mode})
+
+    def complete(self, mrs: List[MergedMR]):
+        self.checkpoint.write({"task": self.key, "path": self.path, "mrs": [mr.to_dict() for mr in mrs],
+                               "done": True})
+
+
+class Checkpoint:
+    """
+    Append-only JSON-lines log of fetch progress, written while a run goes
+    on: one line per fetched page (its MRs and the next page URL) and per
+    completed listing. After an interruption, --resume replays it so
+    completed projects/groups are not fetched again and unfinished ones
+    continue from their last page. The first line identifies the run (URL,
+    window options, selection) and records the resolved window, so a
+    resumed relative window (--days, no --until) keeps the original "now";
+    a log from a different run is ignored.
+    """
+
+    def __init__(self, path: str, run_key: str):
+        self.path = path
+        self.run_key = run_key
+        self.tasks: Dict[str, CheckpointTask] = {}
+        self.lock = threading.Lock()
+        self.f = None
+        self.since_dt: Optional[datetime] = None
+        self.until_dt: Optional[datetime] = None
 
-            if interval_end > interval_start:
-                total += (interval_end - interval_start).total_seconds()
+    @staticmethod
+    def task_key(kind: str, ident: str, since_dt: datetime, until_dt: Optional[datetime]) -> str:
+        return f"{kind}:{ident}:{iso_utc(since_dt)}:{iso_utc(until_dt) if until_dt else ''}"
 
-        current_date += timedelta(days=1)
+    def load(self) -> Optional[int]:
+        """
+        Replay an existing log of the same run, taking over its window.
+        Returns the number of completed listings, or None if there is no
+        log of this run to resume.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            print(f"[info] No checkpoint at {self.path}; starting a fresh run", file=sys.stderr)
+            return None
+        header = json.loads(lines[0]) if lines else {}
+        if header.get("run") != self.run_key or not header.get("since"):
+            print(f"[warn] {self.path} is from a different run; starting over", file=sys.stderr)
+            return None
+        self.since_dt = datetime.fromisoformat(header["since"])
+        self.until_dt = datetime.fromisoformat(header["until"])
+        for line in lines[1:]:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                break  # torn last line of an interrupted write
+            task = self.task(event["task"])
+            task.path = event.get("path") or task.path
+            task.mrs.extend(event.get("mrs", []))
+            task.next_url, task.mode = event.get("next"), event.get("mode")
+            task.done = bool(event.get("done"))
+        return sum(task.done for task in self.tasks.values())
+
+    def open(self, since_dt: datetime, until_dt: datetime):
+        """Start the log for the resolved window, carrying over what load() replayed."""
+        self.since_dt, self.until_dt = since_dt, until_dt
+        self.f = open(self.path, "w", encoding="utf-8")
+        header = {"run": self.run_key, "since": since_dt.isoformat(), "until": until_dt.isoformat()}
+        self.f.write(json.dumps(header) + "\n")
+        for task in self.tasks.values():
+            event = {"task": task.key, "path": task.path, "mrs": task.mrs,
+                     "next": task.next_url, "mode": task.mode, "done": task.done}
+            self.f.write(json.dumps(event) + "\n")
+        self.f.flush()
+
+    def task(self, key: str) -> CheckpointTask:
+        with self.lock:
+            if key not in self.tasks:
+                self.tasks[key] = CheckpointTask(self, key)
+            return self.tasks[key]
+
+    def write(self, event: dict):
+        line = json.dumps(event) + "\n"
+        with self.lock:
+            self.f.write(line)
+            self.f.flush()
+
+    def close(self, remove: bool):
+        self.f.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+# ------------------------------
+# GraphQL backend
+# ------------------------------
+
+# A page of 50 MRs for 5 listings stays well inside GitLab's query
+# complexity limit (250 for authenticated users)
+GRAPHQL_PAGE_SIZE = 50
+# Only the MR fields the report reads; REST list pages carry every field
+GRAPHQL_MR_FIELDS = "iid title createdAt mergedAt updatedAt sourceBranch targetBranch webUrl author { username name }"
+
+
+def graphql_id(gid: str) -> str:
+    """Numeric id of a global id ("gid://gitlab/Project/101" -> "101")."""
+    return gid.rsplit("/", 1)[-1]
+
+
+def graphql_mr(node: dict, project_id: str, project_path: str) -> dict:
+    """Reshape a GraphQL MergeRequest node into the REST payload fields MergedMR reads."""
+    iid = int(node["iid"])
+    author = node.get("author") or {}
+    return {
+        "project_id": int(project_id),
+        "iid": iid,
+        "title": node.get("title") or "",
+        "author": {"username": author.get("username"), "name": author.get("name")},
+        "created_at": node["createdAt"],
+        "merged_at": node.get("mergedAt"),
+        "updated_at": node.get("updatedAt"),
+        "target_branch": node.get("targetBranch", ""),
+        "source_branch": node.get("sourceBranch", ""),
+        "web_url": node.get("webUrl", ""),
+        "references": {"full": f"{project_path}!{iid}"},
+    }
+
+
+class GraphQLListing:
+    """
+    One merged-MR listing (a project or group, for one window shard) paged
+    through GraphQL with its own cursor, so listings of many projects can
+    share each query. Progress goes through a ListingCollector, so
+    checkpoints record the cursor like a REST next-page URL. `mrs` is set
+    once the last page is in, and stays None if the listing failed.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        ident: str,
+        path: str,
+        since_dt: datetime,
+        until_dt: Optional[datetime],
+        task: Optional[CheckpointTask],
+    ):
+        self.kind = kind  # "project" or "group"
+        self.ident = ident
+        self.path = path
+        self.since_dt = since_dt
+        self.until_dt = until_dt
+        if task is not None:
+            task.path = path
+        self.collector = ListingCollector(since_dt, until_dt, task)
+        self.cursor = self.collector.resume[0] if self.collector.resume else None
+        self.finished = self.collector.done
+        self.mrs: Optional[List[MergedMR]] = self.collector.finish() if self.finished else None
+
+    def selection(self, i: int) -> Tuple[str, str, dict]:
+        """Variable declarations, aliased field and variables for slot `i` of a query."""
+        group = self.kind == "group"
+        decls = f"$path{i}: ID!, $after{i}: Time, $before{i}: Time, $cursor{i}: String"
+        field = (
+            f"  l{i}: {self.kind}(fullPath: $path{i}) {{\n"
+            f"    id fullPath\n"
+            f"    mergeRequests(state: merged, mergedAfter: $after{i}, mergedBefore: $before{i}, "
+            f"sort: MERGED_AT_DESC, first: {GRAPHQL_PAGE_SIZE}, after: $cursor{i}"
+            f"{', includeSubgroups: true' if group else ''}) {{\n"
+            f"      pageInfo {{ hasNextPage endCursor }}\n"
+            f"      nodes {{ {GRAPHQL_MR_FIELDS}{' project { id fullPath }' if group else ''} }}\n"
+            f"    }}\n"
+            f"  }}"
+        )
+        variables = {
+            f"path{i}": self.path,
+            f"after{i}": query_lower_bound(self.since_dt),
+            f"before{i}": query_upper_bound(self.until_dt) if self.until_dt else None,
+            f"cursor{i}": self.cursor,
+        }
+        return decls, field, variables
+
+    def add_page(self, node: Optional[dict]):
+        if node is None:
+            self.fail(f"{self.kind} {self.path} not found")
+            return
+        conn = node["mergeRequests"]
+        if self.kind == "group":
+            batch = [graphql_mr(mr, graphql_id(mr["project"]["id"]), mr["project"]["fullPath"])
+                     for mr in conn["nodes"]]
+        else:
+            pid, path = graphql_id(node["id"]), node["fullPath"]
+            batch = [graphql_mr(mr, pid, path) for mr in conn["nodes"]]
+        info = conn["pageInfo"]
+        self.cursor = info["endCursor"] if info["hasNextPage"] else None
+        self.collector.add_page(batch, self.cursor, "graphql")
+        if self.cursor is None:
+            self.finished = True
+            self.mrs = self.collector.finish()
+
+    def fail(self, reason: Any):
+        label = f"group {self.ident}" if self.kind == "group" else self.ident
+        print(f"[warn] Could not list MRs for {label}: {reason}", file=sys.stderr)
+        self.finished = True
+
+    def take(self) -> Optional[List[MergedMR]]:
+        """Hand over the listing's MRs (None if it failed) without keeping a reference."""
+        mrs, self.mrs = self.mrs, None
+        self.collector.records = []
+        return mrs
+
+
+def graphql_mrs_query(listings: List[GraphQLListing]) -> Tuple[str, dict]:
+    decls, fields, variables = [], [], {}
+    for i, listing in enumerate(listings):
+        d, f, v = listing.selection(i)
+        decls.append(d)
+        fields.append(f)
+        variables.update(v)
+    return "query(" + ", ".join(decls) + ") {\n" + "\n".join(fields) + "\n}", variables
+
+
+def run_graphql_listings(
+    gl: GitLab,
+    listings: List[GraphQLListing],
+    batch_size: int,
+    on_finished: Optional[Callable[[GraphQLListing], None]] = None,
+):
+    """
+    Page through all listings, up to `batch_size` of them per query. A
+    listing keeps its slot until its last page; the next one then takes it.
+    A query that fails as a whole is retried in halves, so only a listing
+    that fails on its own is given up. Each listing is passed to
+    `on_finished` once it completed or failed.
+    """
+    def finished(listing: GraphQLListing) -> bool:
+        if listing.finished and on_finished is not None:
+            on_finished(listing)
+        return listing.finished
+
+    def next_pages(batch: List[GraphQLListing]):
+        query, variables = graphql_mrs_query(batch)
+        try:
+            data = gl.graphql(query, variables)
+        except RequestBudgetExceeded:
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].fail(e)
+                return
+            print(f"[warn] GraphQL query for {len(batch)} listings failed ({e}); retrying in halves",
+                  file=sys.stderr)
+            half = len(batch) // 2
+            next_pages(batch[:half])
+            next_pages(batch[half:])
+            return
+        for i, listing in enumerate(batch):
+            listing.add_page(data.get(f"l{i}"))
+
+    pending = [listing for listing in listings if not finished(listing)]
+    while pending:
+        next_pages(pending[:batch_size])
+        pending = [listing for listing in pending if not finished(listing)]
+
+
+def graphql_project_paths(gl: GitLab, project_ids: List[str]) -> Dict[str, str]:
+    """
+    Full paths of the given projects: from the registry, else resolved 100
+    ids per query. Projects that cannot be read are left out.
+    """
+    paths: Dict[str, str] = {}
+    missing = []
+    for pid in project_ids:
+        entry = gl.registry.lookup(pid)
+        if entry and entry.get("path_with_namespace"):
+            paths[pid] = entry["path_with_namespace"]
+        else:
+            missing.append(pid)
+    query = "query($ids: [ID!]) { projects(ids: $ids, first: 100) { nodes { id fullPath } } }"
+    for start in range(0, len(missing), 100):
+        chunk = missing[start:start + 100]
+        try:
+            data = gl.graphql(query, {"ids": [f"gid://gitlab/Project/{pid}" for pid in chunk]})
+        except RequestBudgetExceeded:
+            raise
+        except Exception as e:
+            for pid in chunk:
+                print(f"[warn] Could not read project {pid}: {e}", file=sys.stderr)
+            continue
+        for node in (data.get("projects") or {}).get("nodes") or []:
+            pid = graphql_id(node["id"])
+            paths[pid] = gl.registry.add({"id": pid, "path_with_namespace": node["fullPath"]})["path_with_namespace"]
+        for pid in chunk:
+            if pid not in paths:
+                print(f"[warn] Could not read project {pid}: not found", file=sys.stderr)
+    return paths
+
+
+def graphql_group_path(gl: GitLab, group: str) -> str:
+    """GraphQL looks groups up by full path only; numeric ids are resolved through REST."""
+    if not group.isdigit():
+        return group
+    return gl.get(f"{gl.base_url}/api/v4/groups/{group}", params={"with_projects": "false"}).json()["full_path"]
+
+
+def fetch_all_graphql(
+    gl: GitLab,
+    groups: List[str],
+    project_ids: List[str],
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    shard_days: int = 0,
+    checkpoint: Optional[Checkpoint] = None,
+    batch_size: int = 5,
+    sink: Optional["ResultSink"] = None,
+):
+    """
+    Same as fetch_all(), through the GraphQL API: each query selects only the
+    fields the report uses and pages up to `batch_size` listings at once;
+    projects go to `sink` as their last page comes in.
+    GraphQL always filters by merge date server-side, so shards apply on any
+    GitLab version.
+    """
+    def task(kind: str, ident: str, a: datetime, b: Optional[datetime]) -> Optional[CheckpointTask]:
+        if checkpoint is None:
+            return None
+        return checkpoint.task(Checkpoint.task_key(f"graphql-{kind}", ident, a, b))
+
+    shards = plan_shards(True, since_dt, until_dt, shard_days, state)
+
+    group_listings = []
+    for group in groups:
+        print(f"[info] Fetching MRs for group {group}...", file=sys.stderr)
+        try:
+            path = graphql_group_path(gl, group)
+        except RequestBudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"[warn] Could not list MRs for group {group}: {e}", file=sys.stderr)
+            continue
+        for a, b in shards:
+            fetch_since = state.group_fetch_since(group, a) if state is not None else a
+            fetch_until = None if state is not None else b
+            listing = GraphQLListing("group", group, path, fetch_since, fetch_until,
+                                     task("group", group, fetch_since, fetch_until))
+            group_listings.append((listing, a, b))
+    run_graphql_listings(gl, [listing for listing, _, _ in group_listings], batch_size)
+    mr_lists = []
+    for listing, a, b in group_listings:
+        mrs = listing.take()
+        if mrs is not None and state is not None:
+            mrs = state.record_group(listing.ident, mrs, a, b)
+        mr_lists.append(mrs or [])
+    buckets = bucket_mrs_by_project(mr_lists, gl.registry)
+    del group_listings, mr_lists
+    remaining = [pid for pid in project_ids if pid not in buckets]
+    emit_buckets(buckets, sink)
+
+    results = ProjectResults(remaining, len(shards), sink)
+    windows: Dict[GraphQLListing, Tuple[datetime, datetime]] = {}
+
+    def project_finished(listing: GraphQLListing):
+        a, b = windows.pop(listing)
+        mrs = listing.take()
+        if mrs is not None and state is not None:
+            mrs = state.record_project(listing.ident, listing.path, mrs, a, b)
+        results.add(listing.ident, (listing.path, mrs) if mrs is not None else None)
+
+    paths = graphql_project_paths(gl, remaining)
+    project_listings: List[GraphQLListing] = []
+    for pid in remaining:
+        path_ns = paths.get(pid)
+        for a, b in shards:
+            if path_ns is None:
+                results.add(pid, None)
+                continue
+            fetch_since = state.project_fetch_since(pid, a) if state is not None else a
+            fetch_until = None if state is not None else b
+            listing = GraphQLListing("project", pid, path_ns, fetch_since, fetch_until,
+                                     task("project", pid, fetch_since, fetch_until))
+            if listing.finished:
+                print(f"[info] Reusing checkpointed MRs for {path_ns} (id={pid})", file=sys.stderr)
+            else:
+                print(f"[info] Fetching MRs for {path_ns} (id={pid})...", file=sys.stderr)
+            windows[listing] = (a, b)
+            project_listings.append(listing)
+    run_graphql_listings(gl, project_listings, batch_size, project_finished)
+
+
+# ------------------------------
+# Fetch helpers
+# ------------------------------
+
+
+def project_task(
+    checkpoint: Optional[Checkpoint],
+    pid: str,
+    since_dt: datetime,
+    until_dt: Optional[datetime],
+) -> Optional[CheckpointTask]:
+    if checkpoint is None:
+        return None
+    return checkpoint.task(Checkpoint.task_key("project", pid, since_dt, until_dt))
+
+
+def group_task(
+    checkpoint: Optional[Checkpoint],
+    group: str,
+    since_dt: datetime,
+    until_dt: Optional[datetime],
+) -> Optional[CheckpointTask]:
+    if checkpoint is None:
+        return None
+    return checkpoint.task(Checkpoint.task_key("group", group, since_dt, until_dt))
+
+
+def fetch_project_mrs(
+    gl: GitLab,
+    pid: str,
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Optional[Tuple[str, List[MergedMR]]]:
+    """
+    Fetch the MRs of a single project merged within the window.
+    Returns (path_with_namespace, mrs), or None if the project could not be
+    read; failures are logged and never affect other projects.
+    With a SyncState, only MRs updated since the last run are fetched and
+    the MRs come from the merged dataset. With a Checkpoint, the listing is
+    recorded as it goes and resumed where a previous run stopped.
+    """
+    # Fetch up to "now" so the high water mark leaves no gaps
+    fetch_since = state.project_fetch_since(pid, since_dt) if state is not None else since_dt
+    fetch_until = None if state is not None else until_dt
+    task = project_task(checkpoint, pid, fetch_since, fetch_until)
+    try:
+        if task is not None and task.path:
+            path_ns = task.path
+        else:
+            path_ns = gl.project(pid).get("path_with_namespace", pid)
+        if task is not None and task.done:
+            print(f"[info] Reusing checkpointed MRs for {path_ns} (id={pid})", file=sys.stderr)
+        else:
+            print(f"[info] Fetching MRs for {path_ns} (id={pid})...", file=sys.stderr)
+    except RequestBudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"[warn] Could not read project {pid}: {e}", file=sys.stderr)
+        return None
+
+    try:
+        if task is not None:
+            task.path = path_ns
+        mrs = gl.merged_mrs_since(pid, fetch_since, fetch_until, task)
+        if state is not None:
+            mrs = state.record_project(pid, path_ns, mrs, since_dt, until_dt)
+    except RequestBudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"[warn] Could not list MRs for {pid}: {e}", file=sys.stderr)
+        return None
+
+    return path_ns, mrs
+
+
+async def fetch_project_mrs_async(
+    agl: AsyncGitLab,
+    pid: str,
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Optional[Tuple[str, List[MergedMR]]]:
+    """Same as fetch_project_mrs(), using the asyncio client."""
+    fetch_since = state.project_fetch_since(pid, since_dt) if state is not None else since_dt
+    fetch_until = None if state is not None else until_dt
+    task = project_task(checkpoint, pid, fetch_since, fetch_until)
+    try:
+        if task is not None and task.path:
+            path_ns = task.path
+        else:
+            path_ns = (await agl.project(pid)).get("path_with_namespace", pid)
+        if task is not None and task.done:
+            print(f"[info] Reusing checkpointed MRs for {path_ns} (id={pid})", file=sys.stderr)
+        else:
+            print(f"[info] Fetching MRs for {path_ns} (id={pid})...", file=sys.stderr)
+    except RequestBudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"[warn] Could not read project {pid}: {e}", file=sys.stderr)
+        return None
+
+    try:
+        if task is not None:
+            task.path = path_ns
+        mrs = await agl.merged_mrs_since(pid, fetch_since, fetch_until, task)
+        if state is not None:
+            mrs = state.record_project(pid, path_ns, mrs, since_dt, until_dt)
+    except RequestBudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"[warn] Could not list MRs for {pid}: {e}", file=sys.stderr)
+        return None
+
+    return path_ns, mrs
+
+
+def fetch_group_mrs(
+    gl: GitLab,
+    group: str,
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> List[MergedMR]:
+    print(f"[info] Fetching MRs for group {group}...", file=sys.stderr)
+    try:
+        fetch_since = state.group_fetch_since(group, since_dt) if state is not None else since_dt
+        fetch_until = None if state is not None else until_dt
+        task = group_task(checkpoint, group, fetch_since, fetch_until)
+        mrs = gl.group_merged_mrs_since(group, fetch_since, fetch_until, task)
+        if state is not None:
+            return state.record_group(group, mrs, since_dt, until_dt)
+        return mrs
+    except RequestBudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"[warn] Could not list MRs for group {group}: {e}", file=sys.stderr)
+        return []
+
+
+async def fetch_group_mrs_async(
+    agl: AsyncGitLab,
+    group: str,
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> List[MergedMR]:
+    print(f"[info] Fetching MRs for group {group}...", file=sys.stderr)
+    try:
+        fetch_since = state.group_fetch_since(group, since_dt) if state is not None else since_dt
+        fetch_until = None if state is not None else until_dt
+        task = group_task(checkpoint, group, fetch_since, fetch_until)
+        mrs = await agl.group_merged_mrs_since(group, fetch_since, fetch_until, task)
+        if state is not None:
+            return state.record_group(group, mrs, since_dt, until_dt)
+        return mrs
+    except RequestBudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"[warn] Could not list MRs for group {group}: {e}", file=sys.stderr)
+        return []
+
+
+def bucket_mrs_by_project(
+    mr_lists: List[List[MergedMR]],
+    registry: Optional[ProjectRegistry] = None,
+) -> Dict[str, Tuple[str, List[MergedMR]]]:
+    """
+    Group MRs from group-level listings by project id:
+    {project_id: (path_with_namespace, mrs)}. MRs seen through more than
+    one (overlapping) group are kept once. Projects discovered this way are
+    recorded in `registry`, if given.
+    """
+    buckets: Dict[str, Tuple[str, List[MergedMR]]] = {}
+    seen = set()
+    for mrs in mr_lists:
+        for mr in mrs:
+            pid = str(mr.project_id)
+            key = (pid, mr.iid)
+            if key in seen:
+                continue
+            seen.add(key)
+            if pid not in buckets:
+                buckets[pid] = (mr.project_path, [])
+                if registry is not None:
+                    registry.add({"id": pid, "path_with_namespace": buckets[pid][0]})
+            buckets[pid][1].append(mr)
+    return buckets
 
-    return total
 
+# Receives (project_id, (path_with_namespace, mrs) or None) for each project
+ResultSink = Callable[[str, Optional[Tuple[str, List[MergedMR]]]], None]
 
-# ------------------------------
-# API
-# ------------------------------
 
+class ProjectResults:
+    """
+    Collects per-(project, shard) results and hands each project to `sink`
+    as soon as all of its shards are in, de-duplicating MRs by iid, so a
+    project's MRs can be reported and released while others are still being
+    fetched. A project with a failed shard is passed on as None, like a
+    failed unsharded fetch.
+    """
 
-class GitLab:
-    def __init__(self, base_url: str, token: str):
-        self.base_url = base_url.rstrip("/")
-        self.sess = requests.Session()
-        self.sess.headers.update({"PRIVATE-TOKEN": token})
+    def __init__(self, project_ids: List[str], shard_count: int, sink: ResultSink):
+        self.shard_count = shard_count
+        self.sink = sink
+        self.parts: Dict[str, List[Optional[Tuple[str, List[MergedMR]]]]] = {pid: [] for pid in project_ids}
+
+    def add(self, pid: str, result: Optional[Tuple[str, List[MergedMR]]]):
+        parts = self.parts[pid]
+        parts.append(result)
+        if len(parts) < self.shard_count:
+            return
+        del self.parts[pid]
+        if any(part is None for part in parts):
+            self.sink(pid, None)
+            return
+        by_iid: Dict[Any, MergedMR] = {}
+        for _, mrs in parts:
+            for mr in mrs:
+                by_iid.setdefault(mr.iid, mr)
+        self.sink(pid, (parts[0][0], list(by_iid.values())))
+
+
+def emit_buckets(buckets: Dict[str, Tuple[str, List[MergedMR]]], sink: ResultSink):
+    """Hand the projects found through group listings to `sink`, releasing each."""
+    for pid in list(buckets):
+        sink(pid, buckets.pop(pid))
+
+
+def window_shards(since_dt: datetime, until_dt: datetime, shard_days: int) -> List[Tuple[datetime, datetime]]:
+    """Split [since_dt, until_dt] into consecutive shards of at most shard_days."""
+    if shard_days <= 0:
+        return [(since_dt, until_dt)]
+    shards = []
+    start = since_dt
+    while True:
+        end = min(start + timedelta(days=shard_days), until_dt)
+        shards.append((start, end))
+        if end >= until_dt:
+            return shards
+        start = end
+
+
+def plan_shards(
+    merged_filters: bool,
+    since_dt: datetime,
+    until_dt: datetime,
+    shard_days: int,
+    state: Optional[SyncState],
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Shards only pay off when the server bounds each one by merge date; with
+    updated_after alone every shard would re-read all later MRs. Incremental
+    runs fetch from their high water mark instead.
+    """
+    if not merged_filters or state is not None:
+        return [(since_dt, until_dt)]
+    shards = window_shards(since_dt, until_dt, shard_days)
+    if len(shards) > 1:
+        print(f"[info] Fetching the window as {len(shards)} shards of up to {shard_days} days", file=sys.stderr)
+    return shards
+
+
+def fetch_all(
+    gl: GitLab,
+    workers: int,
+    groups: List[str],
+    project_ids: List[str],
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    shard_days: int = 0,
+    checkpoint: Optional[Checkpoint] = None,
+    sink: Optional[ResultSink] = None,
+):
+    """
+    Fetch groups first, then every requested project that no group listing
+    already covered, sequentially or through a pool of `workers` threads.
+    With shard_days, each group/project is fetched as independent
+    merge-date shards of the window. Each project goes to `sink` (on the
+    calling thread) as soon as it is complete, in completion order; group
+    listings are split by project once all groups are in, since groups may
+    overlap.
+    """
+    shards = plan_shards(gl.supports_merged_filters(), since_dt, until_dt, shard_days, state)
+    group_tasks = [(g, a, b) for g in groups for a, b in shards]
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            mr_lists = list(pool.map(
+                lambda task: fetch_group_mrs(gl, task[0], task[1], task[2], state, checkpoint), group_tasks,
+            ))
+    else:
+        mr_lists = [fetch_group_mrs(gl, g, a, b, state, checkpoint) for g, a, b in group_tasks]
+    buckets = bucket_mrs_by_project(mr_lists, gl.registry)
+    del mr_lists
+    remaining = [pid for pid in project_ids if pid not in buckets]
+    emit_buckets(buckets, sink)
+
+    results = ProjectResults(remaining, len(shards), sink)
+    project_tasks = [(pid, a, b) for pid in remaining for a, b in shards]
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fetch_project_mrs, gl, pid, a, b, state, checkpoint): pid
+                for pid, a, b in project_tasks
+            }
+            for future in as_completed(futures):
+                results.add(futures.pop(future), future.result())
+    else:
+        for pid, a, b in project_tasks:
+            results.add(pid, fetch_project_mrs(gl, pid, a, b, state, checkpoint))
+
+
+async def fetch_all_async(
+    agl: AsyncGitLab,
+    groups: List[str],
+    project_ids: List[str],
+    since_dt: datetime,
+    until_dt: datetime,
+    state: Optional[SyncState] = None,
+    shard_days: int = 0,
+    checkpoint: Optional[Checkpoint] = None,
+    sink: Optional[ResultSink] = None,
+):
+    """Same as fetch_all(), using the asyncio client."""
+    async def fetch_project(pid: str, a: datetime, b: datetime):
+        return pid, await fetch_project_mrs_async(agl, pid, a, b, state, checkpoint)
+
+    async with agl:
+        shards = plan_shards(await agl.supports_merged_filters(), since_dt, until_dt, shard_days, state)
+        buckets = bucket_mrs_by_project(
+            await asyncio.gather(*[
+                fetch_group_mrs_async(agl, g, a, b, state, checkpoint) for g in groups for a, b in shards
+            ]),
+            agl.registry,
+        )
+        remaining = [pid for pid in project_ids if pid not in buckets]
+        emit_buckets(buckets, sink)
+
+        results = ProjectResults(remaining, len(shards), sink)
+        for done in asyncio.as_completed([fetch_project(pid, a, b) for pid in remaining for a, b in shards]):
+            results.add(*await done)
+
+
+DETAIL_FIELDS = [
+    "project_id",
+    "project_path_with_namespace",
+    "iid",
+    "title",
+    "author",
+    "created_at",
+    "merged_at",
+    "time_open_hours",
+    "time_open_days",
+    "business_time_open_hours",
+    "business_time_open_days",
+    "target_branch",
+    "source_branch",
+    "web_url",
+]
+
+
+class DetailRow(NamedTuple):
+    """One line of the detailed CSV (fields in DETAIL_FIELDS order)."""
+    project_id: str
+    project_path_with_namespace: str
+    iid: int
+    title: str
+    author: str
+    created_at: str
+    merged_at: str
+    time_open_hours: float
+    time_open_days: float
+    business_time_open_hours: float
+    business_time_open_days: float
+    target_branch: str
+    source_branch: str
+    web_url: str
+
+
+def build_project_rows(
+    pid: str,
+    path_ns: str,
+    mrs: List[MergedMR],
+    exclude_authors: List[str],
+    calendar: BusinessCalendar = DEFAULT_CALENDAR,
+) -> Tuple[str, List[DetailRow], List[float]]:
+    """
+    Turn a project's merged MRs (already limited to the date window) into
+    detail rows and raw durations.
+    """
+    kept = []
+    for mr in mrs:
+        # ------------------------------------------
+        # Exclude authors passed via CLI / file
+        # ------------------------------------------
+        author_name = (mr.author_name or "").strip()
+        author_username = (mr.author_username or "").strip()
+
+        if author_name in exclude_authors or author_username in exclude_authors:
+            continue
 
-    def get(self, url: str, params: dict = None) -> requests.Response:
-        r = self.sess.get(url, params=params, timeout=60)
-        r.raise_for_status()
-        sleep_if_rate_limited(r)
-        return r
+        kept.append((mr, author_username or author_name))
 
-    def get_json_paged(self, url: str, params: dict = None) -> List[dict]:
-        items = []
-        first = True
-        while True:
-            r = self.get(url if not first else url, params=params if first else None)
-            first = False
-            batch = r.json()
-            if isinstance(batch, list):
-                items.extend(batch)
-            else:
-                raise RuntimeError(f"Expected list from {url}")
-            nxt = next_link_from_headers(r)
-            if not nxt:
-                break
-            url = nxt
-        return items
+    # Durations for the whole project at once
+    raw_secs, business_secs = calendar.durations(
+        [mr.created_us for mr, _ in kept],
+        [mr.merged_us for mr, _ in kept],
+    )
 
-    def project(self, project_id_or_path: str) -> dict:
-        # Accepts numeric id or path; path must be URL-encoded
-        if project_id_or_path.isdigit():
-            url = f"{self.base_url}/api/v4/projects/{project_id_or_path}"
-        else:
-            url = f"{self.base_url}/api/v4/projects/{urlquote(project_id_or_path, safe='')}"
-        return self.get(url).json()
+    rows: List[DetailRow] = []
+    seconds: List[float] = []
+    for (mr, author), delta_sec, business_delta_sec in zip(kept, raw_secs, business_secs):
+        hrs, dys = s_to_hours_days(delta_sec)
+        biz_hrs, biz_dys = s_to_hours_days(business_delta_sec)
+
+        rows.append(DetailRow(
+            pid,
+            path_ns,
+            mr.iid,
+            mr.title,
+            author,
+            utc_from_epoch_us(mr.created_us).isoformat(),
+            utc_from_epoch_us(mr.merged_us).isoformat(),
+            hrs,
+            dys,
+            biz_hrs,
+            biz_dys,
+            mr.target_branch,
+            mr.source_branch,
+            mr.web_url,
+        ))
+        seconds.append(delta_sec)
+
+    return path_ns, rows, seconds
+
+
+class DetailRuns:
+    """
+    External sort of the detailed CSV for --stream-detail: each project's
+    rows are sorted by merged_at desc and written to a run file as soon as
+    they are built, then the runs are merged into the output with at most
+    FAN_IN files open at a time, so memory stays flat however many rows are
+    exported. Ties are broken by project id, then keep each project's row
+    order, exactly like the in-memory sort.
+    """
 
-    def merged_mrs_since(self, project_id: str, since_dt: datetime) -> List[dict]:
-        """
-        Use state=merged + updated_after for server-side narrowing,
-        then strictly filter by merged_at >= since_dt client-side.
-        """
-        url = f"{self.base_url}/api/v4/projects/{project_id}/merge_requests"
-        params = {
-            "state": "merged",
-            "per_page": 100,
-            "order_by": "updated_at",
-            "sort": "desc",
-            "updated_after": iso_utc(since_dt),
-            "scope": "all",
-        }
-        items = self.get_json_paged(url, params=params)
-        cutoff = since_dt.astimezone(timezone.utc)
-        recent = []
-        for mr in items:
-            merged_at = mr.get("merged_at")
-            if not merged_at:
-                continue
-            merged_dt = parse_dt(merged_at).astimezone(timezone.utc)
-            if merged_dt >= cutoff:
-                recent.append(mr)
-        return recent
+    FAN_IN = 64
+    MERGED_AT = DETAIL_FIELDS.index("merged_at")
+
+    @staticmethod
+    def sort_key(row) -> Tuple[str, int]:
+        """Key for merged_at desc, then project id asc, when sorting with reverse=True."""
+        return row[DetailRuns.MERGED_AT], -int(row[0])
+
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix="review-duration-")
+        self.paths: List[str] = []
+        self.count = 0
+
+    def new_path(self) -> str:
+        path = os.path.join(self.dir, f"run-{len(self.paths)}-{self.count}.csv")
+        self.count += 1
+        return path
+
+    def add(self, rows: List[DetailRow]):
+        if not rows:
+            return
+        path = self.new_path()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(sorted(rows, key=self.sort_key, reverse=True))
+        self.paths.append(path)
+
+    def merge(self, paths: List[str], writer) -> int:
+        """Merge run files (in order) into a csv writer; returns the row count."""
+        n = 0
+        with ExitStack() as stack:
+            readers = [
+                csv.reader(stack.enter_context(open(path, "r", newline="", encoding="utf-8")))
+                for path in paths
+            ]
+            for row in heapq.merge(*readers, key=self.sort_key, reverse=True):
+                writer.writerow(row)
+                n += 1
+        for path in paths:
+            os.remove(path)
+        return n
+
+    def write(self, writer) -> int:
+        """Write all rows, in merged_at desc order, to a csv writer."""
+        paths = self.paths
+        while len(paths) > self.FAN_IN:
+            merged = []
+            for i in range(0, len(paths), self.FAN_IN):
+                path = self.new_path()
+                with open(path, "w", newline="", encoding="utf-8") as f:
+                    self.merge(paths[i:i + self.FAN_IN], csv.writer(f))
+                merged.append(path)
+            paths = merged
+        self.paths = []
+        return self.merge(paths, writer)
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
 
 
 # ------------------------------
@@ -236,25 +2772,133 @@ def extract_path_from_url_or_path(s: str) -> str:
     return s.strip("/")
 
 
-def summarize_rows(rows: List[dict]) -> str:
-    if not rows:
+class ExactDurations:
+    """Exact duration aggregator (default --summary-mode): keeps every value."""
+
+    def __init__(self):
+        self.values: List[float] = []
+
+    def add(self, seconds: float):
+        self.values.append(seconds)
+
+    def merge(self, other: "ExactDurations"):
+        self.values.extend(other.values)
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    def mean(self) -> float:
+        return math.fsum(self.values) / len(self.values) if self.values else 0.0
+
+    def min(self) -> float:
+        return min(self.values) if self.values else 0.0
+
+    def max(self) -> float:
+        return max(self.values) if self.values else 0.0
+
+    def quantiles(self, ps: List[float]) -> List[float]:
+        return percentiles(self.values, ps)
+
+
+class DDSketch:
+    """
+    DDSketch quantile sketch (--summary-mode sketch): durations are counted
+    in logarithmic buckets, so any quantile is within `relative_accuracy` of
+    the exact value while memory depends only on the range of durations, not
+    on how many there are. Count, mean, min and max stay exact. Sketches with
+    the same accuracy can be merged, as the overall line merges the
+    per-project sketches.
+
+    Non-positive durations (clock skew) are counted as zero.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min_value = math.inf
+        self.max_value = -math.inf
+
+    def add(self, seconds: float):
+        if seconds > 0:
+            key = math.ceil(math.log(seconds) / self.log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.sum += seconds
+        self.min_value = min(self.min_value, seconds)
+        self.max_value = max(self.max_value, seconds)
+
+    def merge(self, other: "DDSketch"):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def min(self) -> float:
+        return self.min_value if self.count else 0.0
+
+    def max(self) -> float:
+        return self.max_value if self.count else 0.0
+
+    def value_at_rank(self, rank: int) -> float:
+        """Estimate of the rank-th smallest duration (0-based)."""
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min_value, 0.0)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min_value), self.max_value)
+        return self.max_value
+
+    def quantile(self, p: float) -> float:
+        """Interpolated like percentiles(), so results track exact mode."""
+        if not self.count:
+            return 0.0
+        k = (self.count - 1) * p
+        f = math.floor(k)
+        c = math.ceil(k)
+        if f == c:
+            return self.value_at_rank(f)
+        return self.value_at_rank(f) * (c - k) + self.value_at_rank(c) * (k - f)
+
+    def quantiles(self, ps: List[float]) -> List[float]:
+        return [self.quantile(p) for p in ps]
+
+
+def summarize_durations(durations, qs: List[float] = (0.5, 0.9)) -> str:
+    """One-line stats of an ExactDurations or DDSketch."""
+    if not durations.count:
         return "No merged MRs found in the window."
-    seconds = []
-    for r in rows:
-        c = parse_dt(r["created_at"]).astimezone(timezone.utc)
-        m = parse_dt(r["merged_at"]).astimezone(timezone.utc)
-        seconds.append((m - c).total_seconds())
-    seconds.sort()
-    n = len(seconds)
-    avg = sum(seconds) / n
-    p50 = percentile(seconds, 0.5)
-    p90 = percentile(seconds, 0.9)
+    n = durations.count
+    avg = durations.mean()
 
     def fmt(sec):
         h, d = s_to_hours_days(sec)
         return f"{h}h ({d}d)"
 
-    return f"Count: {n} | Avg: {fmt(avg)} | P50: {fmt(p50)} | P90: {fmt(p90)}"
+    parts = [f"Count: {n}", f"Avg: {fmt(avg)}"]
+    for q, value in zip(qs, durations.quantiles(list(qs))):
+        parts.append(f"{quantile_label(q).upper()}: {fmt(value)}")
+    return " | ".join(parts)
 
 
 # ------------------------------
@@ -291,9 +2935,27 @@ def main():
         default=None,
         help=(
             "File with one project path or full URL per line. "
+            "Lines of the form 'group:<path>' select a whole group. "
             "Blank lines and lines starting with '#' are ignored."
         ),
     )
+    ap.add_argument(
+        "--groups",
+        nargs="*",
+        default=None,
+        help=(
+            "One or more group IDs, paths or URLs. Merged MRs of all their projects "
+            "(including subgroups) are listed in one paginated stream per group."
+        ),
+    )
+    ap.add_argument(
+        "--project-cache",
+        default=None,
+        help=(
+            "JSON file caching resolved project ids/paths between runs. "
+            "Projects found in it are not requested from the API again."
+        ),
+    )
     ap.add_argument(
         "--days",
         type=int,
@@ -338,6 +3000,225 @@ def main():
             "Blank lines and lines starting with '#' are ignored."
         ),
     )
+    ap.add_argument(
+        "--business-tz",
+        default="UTC",
+        help="Timezone of business hours, e.g. Europe/Berlin (default: UTC).",
+    )
+    ap.add_argument(
+        "--business-hours",
+        default="09:00-17:00",
+        help="Working hours as HH:MM-HH:MM in --business-tz (default: 09:00-17:00).",
+    )
+    ap.add_argument(
+        "--weekend",
+        default="sat,sun",
+        help="Comma-separated non-working weekdays (default: sat,sun).",
+    )
+    ap.add_argument(
+        "--holidays-file",
+        default=None,
+        help="File with one YYYY-MM-DD holiday per line, excluded from business time.",
+    )
+    ap.add_argument(
+        "--team-calendars",
+        default=None,
+        help=(
+            "JSON file mapping project path prefixes to their own timezone/hours/"
+            "weekend/holidays_file; other projects use the options above."
+        ),
+    )
+    ap.add_argument(
+        "--stream-detail",
+        action="store_true",
+        help=(
+            "Write each project's detail rows to a temporary run as soon as its fetch "
+            "completes and merge-sort the runs into --out, keeping memory flat for very "
+            "large exports."
+        ),
+    )
+    ap.add_argument(
+        "--quantiles",
+        default="50,90",
+        help=(
+            "Comma-separated percentiles the summary reports, e.g. 50,75,90,95,99 "
+            "(default: 50,90); each becomes a pNN_hours column."
+        ),
+    )
+    ap.add_argument(
+        "--summary-mode",
+        choices=["exact", "sketch"],
+        default="exact",
+        help=(
+            "How the summary computes percentiles (default: exact). 'sketch' uses a "
+            "mergeable DDSketch with constant memory per project."
+        ),
+    )
+    ap.add_argument(
+        "--sketch-accuracy",
+        type=float,
+        default=0.01,
+        help="Relative error bound of percentiles with --summary-mode sketch (default: 0.01 = 1%%).",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of projects to fetch concurrently (default: 1, i.e. sequential).",
+    )
+    ap.add_argument(
+        "--shard-days",
+        type=int,
+        default=30,
+        help=(
+            "Fetch long windows as independent shards of this many days (fetched in "
+            "parallel with --workers/--async) when GitLab can filter by merge date "
+            "(default: 30; 0 = no sharding)."
+        ),
+    )
+    ap.add_argument(
+        "--max-requests",
+        type=int,
+        default=int(os.environ.get("MAX_REQUESTS", "5000")),
+        help=(
+            "Abort the run after this many API requests, to avoid accidentally heavy "
+            "queries (default: 5000 or MAX_REQUESTS; 0 = unlimited)."
+        ),
+    )
+    ap.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help=(
+            "Retry a GET this many times after a 5xx response, connection error or "
+            "timeout, with exponential backoff and jitter (default: 3; 0 = no retries)."
+        ),
+    )
+    ap.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=1.0,
+        help="Base backoff in seconds, doubled on each retry (default: 1.0).",
+    )
+    ap.add_argument(
+        "--pagination",
+        choices=["offset", "keyset"],
+        default="offset",
+        help=(
+            "How to page through list endpoints (default: offset). 'keyset' uses "
+            "cursor-based pages where the endpoint supports them and falls back to "
+            "offset pagination elsewhere."
+        ),
+    )
+    ap.add_argument(
+        "--prefetch-pages",
+        type=int,
+        default=0,
+        help=(
+            "When GitLab reports the total number of pages (X-Total-Pages), fetch up "
+            "to this many further pages of a list concurrently (default: 0, sequential)."
+        ),
+    )
+    ap.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help=(
+            "Write a progress log while fetching, removed when the run completes, "
+            "so an interrupted run can be continued with --resume."
+        ),
+    )
+    ap.add_argument(
+        "--checkpoint-file",
+        default=None,
+        help=(
+            "Progress log path; implies --checkpoint (default: "
+            "review_duration_checkpoint-<run>.jsonl, named after the URL, window and selection)."
+        ),
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Continue an interrupted --checkpoint run with the same URL, window and selection: "
+            "completed projects are reused, others continue from their last page. Implies --checkpoint."
+        ),
+    )
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Keep fetched MRs in --state-file and, on later runs, only fetch MRs "
+            "updated since the previous run."
+        ),
+    )
+    ap.add_argument(
+        "--state-file",
+        default="review_duration_state.json",
+        help="State file used by --incremental (default: review_duration_state.json).",
+    )
+    ap.add_argument(
+        "--db",
+        default=None,
+        help="SQLite database to upsert every fetched MR into (created if missing).",
+    )
+    ap.add_argument(
+        "--offline",
+        action="store_true",
+        help=(
+            "Report from --db only, without calling the GitLab API. Projects/groups "
+            "given on the command line select what to report; default: everything."
+        ),
+    )
+    ap.add_argument(
+        "--cache-dir",
+        default=os.environ.get(
+            "REVIEW_DURATION_CACHE_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "review-duration"),
+        ),
+        help=(
+            "Directory for the HTTP response cache; responses are revalidated with "
+            "ETag/Last-Modified. Listing pages of a relative window are reused within "
+            "the same hour only (default: ~/.cache/review-duration or REVIEW_DURATION_CACHE_DIR)."
+        ),
+    )
+    ap.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=512,
+        help="Maximum size of the HTTP response cache; least recently used entries are evicted (default: 512).",
+    )
+    ap.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the HTTP response cache.",
+    )
+    ap.add_argument(
+        "--async",
+        dest="async_client",
+        action="store_true",
+        help="Use the asyncio client (requires aiohttp) instead of --workers threads.",
+    )
+    ap.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=100,
+        help="With --async: maximum number of requests in flight at once (default: 100).",
+    )
+    ap.add_argument(
+        "--backend",
+        choices=["rest", "graphql"],
+        default="rest",
+        help=(
+            "API used to list merged MRs: rest, or graphql to request only the fields the "
+            "report uses, for several projects per query (default: rest)."
+        ),
+    )
+    ap.add_argument(
+        "--graphql-batch",
+        type=int,
+        default=5,
+        help="With --backend graphql: projects/groups listed per query (default: 5).",
+    )
     args = ap.parse_args()
 
     # ---------------------------
@@ -345,7 +3226,7 @@ def main():
     # ---------------------------
     base_url = args.url or os.environ.get("GITLAB_URL")
 
-    if not base_url and sys.stdin.isatty():
+    if not base_url and sys.stdin.isatty() and not args.offline:
         print("Where are your repositories?")
         print("  1) GitLab.com (https://gitlab.com)")
         print()
@@ -361,10 +3242,14 @@ def main():
     # ---------------------------
     # Token
     # ---------------------------
-    if not args.token:
+    if not args.token and not args.offline:
         print("ERROR: Provide a GitLab token via --token or GITLAB_TOKEN.", file=sys.stderr)
         sys.exit(1)
 
+    if args.offline and not args.db:
+        print("ERROR: --offline needs a --db to report from.", file=sys.stderr)
+        sys.exit(1)
+
     # ---------------------------
     # Interactive: dates
     # ---------------------------
@@ -398,38 +3283,66 @@ def main():
         print("ERROR: until date is before since date.", file=sys.stderr)
         sys.exit(1)
 
-    # Safety check: warn if date window > 30 days
-    window_seconds = (until_dt - since_dt).total_seconds()
-    window_days = window_seconds / 86400.0
+    if args.workers < 1:
+        print("ERROR: --workers must be at least 1.", file=sys.stderr)
+        sys.exit(1)
 
-    if window_days > 30:
-        print(
-            f"WARNING: date range is {window_days:.1f} days (> 30). "
-            "This may query many MRs and put load on the repository/API.",
-            file=sys.stderr,
-        )
-        if sys.stdin.isatty():
-            answer = input("Type 'yes' to continue: ").strip().lower()
-            if answer != "yes":
-                print("Aborting at user request.", file=sys.stderr)
-                sys.exit(1)
-        else:
-            print("Non-interactive mode and large date window; aborting.", file=sys.stderr)
-            sys.exit(1)
+    if args.shard_days < 0 or args.max_requests < 0:
+        print("ERROR: --shard-days and --max-requests cannot be negative.", file=sys.stderr)
+        sys.exit(1)
 
-    # ---------------------------
-    # Determine summary output file name
-    # ---------------------------
-    if args.summary_out:
-        summary_filename = args.summary_out
-    else:
-        since_str = since_dt.strftime("%Y-%m-%d")
-        until_str = until_dt.strftime("%Y-%m-%d")
-        summary_filename = f"review_duration_summary_{since_str}_{until_str}.csv"
+    if args.prefetch_pages < 0:
+        print("ERROR: --prefetch-pages cannot be negative.", file=sys.stderr)
+        sys.exit(1)
 
-    print(f"[info] Date window: {since_dt.strftime('%Y-%m-%d')} → {until_dt.strftime('%Y-%m-%d')}", file=sys.stderr)
+    if args.retry_backoff < 0:
+        print("ERROR: --retry-backoff cannot be negative.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.async_client:
+        if aiohttp is None:
+            print("ERROR: --async requires aiohttp (pip install aiohttp).", file=sys.stderr)
+            sys.exit(1)
+        if args.max_concurrency < 1:
+            print("ERROR: --max-concurrency must be at least 1.", file=sys.stderr)
+            sys.exit(1)
+
+    if args.backend == "graphql":
+        if args.async_client:
+            print("ERROR: --backend graphql cannot be combined with --async.", file=sys.stderr)
+            sys.exit(1)
+        if args.graphql_batch < 1:
+            print("ERROR: --graphql-batch must be at least 1.", file=sys.stderr)
+            sys.exit(1)
 
-    gl = GitLab(args.url, args.token)
+    cache = None
+    if not args.no_cache and not args.offline:
+        try:
+            cache = HttpCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, scope=f"{args.url} {args.token}")
+        except OSError as e:
+            print(f"[warn] HTTP cache disabled, cannot use {args.cache_dir}: {e}", file=sys.stderr)
+
+    registry = ProjectRegistry()
+    if args.project_cache:
+        registry.load(args.project_cache)
+
+    # Safety: instead of limiting the date range, cap the number of API
+    # requests a run may make (the client aborts once it is spent).
+    budget = RequestBudget(args.max_requests)
+    governor = RateGovernor()
+    retry = RetryPolicy(max(0, args.retries), args.retry_backoff)
+
+    gl = GitLab(
+        args.url, args.token,
+        pool_size=max(10, args.workers),
+        registry=registry,
+        keyset=args.pagination == "keyset",
+        prefetch_pages=args.prefetch_pages,
+        cache=cache,
+        budget=budget,
+        governor=governor,
+        retry=retry,
+    )
 
     # ---------------------------
     # Projects: collect IDs
@@ -438,29 +3351,41 @@ def main():
     if args.projects:
         project_ids.extend(args.projects)
 
-    # Collect project paths from CLI + file
+    # Collect project paths (and group paths) from CLI + file
     project_paths: List[str] = []
     if args.project_paths:
         project_paths.extend(args.project_paths)
 
+    group_paths: List[str] = []
+    if args.groups:
+        group_paths.extend(extract_path_from_url_or_path(g) for g in args.groups)
+
     if args.project_paths_file:
         try:
-            project_paths.extend(read_list_file(args.project_paths_file))
+            for entry in read_list_file(args.project_paths_file):
+                if entry.startswith(GROUP_PREFIX):
+                    group_paths.append(extract_path_from_url_or_path(entry[len(GROUP_PREFIX):].strip()))
+                else:
+                    project_paths.append(entry)
         except FileNotFoundError:
             print(f"ERROR: project-paths-file not found: {args.project_paths_file}", file=sys.stderr)
             sys.exit(1)
 
-    if project_paths:
+    if project_paths and not args.offline:
         for p in project_paths:
             path = extract_path_from_url_or_path(p)
             try:
                 proj_json = gl.project(path)
                 project_ids.append(str(proj_json["id"]))
+            except RequestBudgetExceeded as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                sys.exit(1)
             except Exception as e:
                 print(f"[warn] Could not resolve {p} → id: {e}", file=sys.stderr)
 
-    if not project_ids:
-        print("ERROR: Provide at least one project via --projects, --project-paths or --project-paths-file.",
+    if not project_ids and not group_paths and not args.offline:
+        print("ERROR: Provide at least one project via --projects, --project-paths, --groups "
+              "or --project-paths-file.",
               file=sys.stderr)
         sys.exit(1)
 
@@ -486,138 +3411,223 @@ def main():
     # Normalize / deduplicate
     exclude_authors = sorted({a.strip() for a in exclude_authors if a.strip()})
 
-    out_rows: List[Dict[str, Any]] = []
-    per_project_seconds: DefaultDict[Tuple[str, str], List[float]] = defaultdict(list)
+    # ---------------------------
+    # Business calendars
+    # ---------------------------
+    calendar_defaults = {
+        "timezone": args.business_tz,
+        "hours": args.business_hours,
+        "weekend": args.weekend,
+        "holidays_file": args.holidays_file,
+    }
+    try:
+        holidays = read_holidays_file(args.holidays_file) if args.holidays_file else []
+        default_calendar = BusinessCalendar(args.business_tz, args.business_hours, args.weekend, holidays)
+        team_calendars = load_team_calendars(args.team_calendars, calendar_defaults) if args.team_calendars else []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"ERROR: invalid business calendar: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    out_rows: List[DetailRow] = []
+    try:
+        quantiles = parse_quantiles(args.quantiles)
+    except ValueError as e:
+        print(f"ERROR: --quantiles: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.summary_mode == "sketch":
+        if not 0 < args.sketch_accuracy < 1:
+            print("ERROR: --sketch-accuracy must be between 0 and 1.", file=sys.stderr)
+            sys.exit(1)
+        new_aggregator = partial(DDSketch, args.sketch_accuracy)
+    else:
+        new_aggregator = ExactDurations
+    per_project_durations: DefaultDict[Tuple[str, str], Any] = defaultdict(new_aggregator)
 
     # ---------------------------
     # Fetch
     # ---------------------------
-    for pid in sorted_project_ids:
+    store = None
+    if args.db:
         try:
-            proj = gl.project(pid)
-            path_ns = proj.get("path_with_namespace", pid)
-            print(f"[info] Fetching MRs for {path_ns} (id={pid})...", file=sys.stderr)
-        except Exception as e:
-            print(f"[warn] Could not read project {pid}: {e}", file=sys.stderr)
-            continue
+            store = MRStore(args.db)
+        except sqlite3.Error as e:
+            print(f"ERROR: cannot open database {args.db}: {e}", file=sys.stderr)
+            sys.exit(1)
 
+    state = None
+    if args.incremental and not args.offline:
+        state = SyncState()
         try:
-            mrs = gl.merged_mrs_since(pid, since_dt)
-        except Exception as e:
-            print(f"[warn] Could not list MRs for {pid}: {e}", file=sys.stderr)
-            continue
+            state.load(args.state_file)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: cannot read state file {args.state_file}: {e}", file=sys.stderr)
+            sys.exit(1)
 
-        strict_mrs = []
-        for mr in mrs:
-            merged_at = mr.get("merged_at")
-            if not merged_at:
-                continue
-            merged_dt = parse_dt(merged_at).astimezone(timezone.utc)
-            if merged_dt <= until_dt:
-                strict_mrs.append(mr)
-
-        for mr in strict_mrs:
-            # ------------------------------------------
-            # Exclude authors passed via CLI / file
-            # ------------------------------------------
-            author = mr.get("author") or {}
-            author_name = (author.get("name") or "").strip()
-            author_username = (author.get("username") or "").strip()
-
-            if author_name in exclude_authors or author_username in exclude_authors:
-                continue
+    checkpoint = None
+    if not args.offline and (args.checkpoint or args.checkpoint_file or args.resume):
+        # Keyed on the window options as given, not on the resolved window:
+        # a relative window moves with "now" and would never match on --resume
+        run_key = hashlib.sha256(json.dumps([
+            args.url, args.since, args.until, None if args.since else args.days,
+            sorted_project_ids, sorted(group_paths),
+        ]).encode("utf-8")).hexdigest()
+        # Named after the run, so concurrent jobs for other runs keep separate logs
+        checkpoint_file = args.checkpoint_file or f"review_duration_checkpoint-{run_key[:12]}.jsonl"
+        checkpoint = Checkpoint(checkpoint_file, run_key)
+        try:
+            if args.resume:
+                done = checkpoint.load()
+                if done is not None:
+                    since_dt, until_dt = checkpoint.since_dt, checkpoint.until_dt
+                    print(f"[info] Resuming from {checkpoint_file} ({done} listings complete)",
+                          file=sys.stderr)
+            checkpoint.open(since_dt, until_dt)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR: cannot use checkpoint file {checkpoint_file}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    # ---------------------------
+    # Determine summary output file name
+    # ---------------------------
+    if args.summary_out:
+        summary_filename = args.summary_out
+    else:
+        since_str = since_dt.strftime("%Y-%m-%d")
+        until_str = until_dt.strftime("%Y-%m-%d")
+        summary_filename = f"review_duration_summary_{since_str}_{until_str}.csv"
+
+    print(f"[info] Date window: {since_dt.strftime('%Y-%m-%d')} → {until_dt.strftime('%Y-%m-%d')}", file=sys.stderr)
+
+    # ---------------------------
+    # Report
+    # ---------------------------
+    # Each project is stored, turned into rows and summarized as soon as its
+    # fetch completes, then its MRs are released; with --stream-detail its
+    # rows go straight to a run file. Rows are sorted at the end, so output
+    # is identical regardless of --workers / --async / --offline.
+    runs = DetailRuns() if args.stream_detail else None
+
+    def report_project(pid: str, result: Optional[Tuple[str, List[MergedMR]]]):
+        if result is None:
+            return
+        path_ns, mrs = result
+        if store is not None and not args.offline:
+            store.upsert(pid, path_ns, mrs)
+        calendar = calendar_for_project(path_ns, team_calendars, default_calendar)
+        path_ns, rows, secs = build_project_rows(pid, path_ns, mrs, exclude_authors, calendar)
+        if runs is not None:
+            runs.add(rows)
+        else:
+            out_rows.extend(rows)
+        if secs:
+            # Projects without kept MRs get no summary row
+            durations = per_project_durations[(pid, path_ns)]
+            for sec in secs:
+                durations.add(sec)
+
+    client = None
+    try:
+        if args.offline:
+            for pid, result in store.query(
+                since_dt, until_dt, sorted_project_ids,
+                [extract_path_from_url_or_path(p) for p in project_paths], group_paths,
+            ):
+                report_project(pid, result)
+        elif args.async_client:
+            client = AsyncGitLab(
+                args.url, args.token,
+                max_concurrency=args.max_concurrency,
+                registry=registry,
+                keyset=args.pagination == "keyset",
+                prefetch_pages=args.prefetch_pages,
+                cache=cache,
+                budget=budget,
+                governor=governor,
+                retry=retry,
+            )
+            asyncio.run(fetch_all_async(
+                client,
+                group_paths, sorted_project_ids, since_dt, until_dt, state, args.shard_days, checkpoint,
+                report_project,
+            ))
+        elif args.backend == "graphql":
+            client = gl
+            fetch_all_graphql(
+                gl,
+                group_paths, sorted_project_ids, since_dt, until_dt, state, args.shard_days, checkpoint,
+                args.graphql_batch, report_project,
+            )
+        else:
+            client = gl
+            fetch_all(
+                gl, args.workers,
+                group_paths, sorted_project_ids, since_dt, until_dt, state, args.shard_days, checkpoint,
+                report_project,
+            )
+    except RequestBudgetExceeded as e:
+        if runs is not None:
+            runs.close()
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.project_cache:
+        registry.save(args.project_cache)
+    if state is not None:
+        state.save(args.state_file)
 
-            c = parse_dt(mr["created_at"]).astimezone(timezone.utc)
-            m = parse_dt(mr["merged_at"]).astimezone(timezone.utc)
-            delta_sec = (m - c).total_seconds()
-            business_delta_sec = business_seconds_between(c, m)
-
-            hrs, dys = s_to_hours_days(delta_sec)
-            biz_hrs, biz_dys = s_to_hours_days(business_delta_sec)
-
-            out_rows.append({
-                "project_id": pid,
-                "project_path_with_namespace": path_ns,
-                "iid": mr["iid"],
-                "title": mr["title"],
-                "author": author_username or author_name,
-                "created_at": c.isoformat(),
-                "merged_at": m.isoformat(),
-                "time_open_hours": hrs,
-                "time_open_days": dys,
-                "business_time_open_hours": biz_hrs,
-                "business_time_open_days": biz_dys,
-                "target_branch": mr.get("target_branch", ""),
-                "source_branch": mr.get("source_branch", ""),
-                "web_url": mr.get("web_url", ""),
-            })
-
-            per_project_seconds[(pid, path_ns)].append(delta_sec)
+    if store is not None:
+        store.close()
+
+    if client is not None:
+        print("[stats pages]", client.page_stats.summary(), file=sys.stderr)
+    if cache is not None:
+        print("[stats cache]", cache.summary(), file=sys.stderr)
 
     # ---------------------------
     # Write detailed CSV
     # ---------------------------
-    out_rows.sort(key=lambda r: r["merged_at"], reverse=True)
-    detail_fields = [
-        "project_id",
-        "project_path_with_namespace",
-        "iid",
-        "title",
-        "author",
-        "created_at",
-        "merged_at",
-        "time_open_hours",
-        "time_open_days",
-        "business_time_open_hours",
-        "business_time_open_days",
-        "target_branch",
-        "source_branch",
-        "web_url",
-    ]
     with open(args.out, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=detail_fields)
-        w.writeheader()
-        w.writerows(out_rows)
-    print(f"[done] Wrote {len(out_rows)} rows to {args.out}")
+        w = csv.writer(f)
+        w.writerow(DETAIL_FIELDS)
+        if runs is not None:
+            try:
+                row_count = runs.write(w)
+            finally:
+                runs.close()
+        else:
+            out_rows.sort(key=DetailRuns.sort_key, reverse=True)
+            w.writerows(out_rows)
+            row_count = len(out_rows)
+    print(f"[done] Wrote {row_count} rows to {args.out}")
 
     # ---------------------------
     # Build & write per-project summary (raw durations only)
     # ---------------------------
     summary_rows: List[Dict[str, Any]] = []
-    for (pid, path_ns), secs in sorted(
-        per_project_seconds.items(),
+    overall = new_aggregator()
+    for (pid, path_ns), durations in sorted(
+        per_project_durations.items(),
         key=lambda item: int(item[0][0]),  # item[0] = (pid, path_ns)
     ):
-        secs.sort()
-        n = len(secs)
-        avg = sum(secs) / n if n else 0.0
-        p50 = percentile(secs, 0.5) if n else 0.0
-        p90 = percentile(secs, 0.9) if n else 0.0
-        mn = secs[0] if n else 0.0
-        mx = secs[-1] if n else 0.0
-        avg_h, _ = s_to_hours_days(avg)
-        p50_h, _ = s_to_hours_days(p50)
-        p90_h, _ = s_to_hours_days(p90)
-        mn_h, _ = s_to_hours_days(mn)
-        mx_h, _ = s_to_hours_days(mx)
-        summary_rows.append({
+        overall.merge(durations)
+        row = {
             "project_id": pid,
             "project_path_with_namespace": path_ns,
-            "count": n,
-            "avg_hours": avg_h,
-            "p50_hours": p50_h,
-            "p90_hours": p90_h,
-            "min_hours": mn_h,
-            "max_hours": mx_h,
-        })
+            "count": durations.count,
+            "avg_hours": s_to_hours_days(durations.mean())[0],
+        }
+        for q, value in zip(quantiles, durations.quantiles(quantiles)):
+            row[f"{quantile_label(q)}_hours"] = s_to_hours_days(value)[0]
+        row["min_hours"] = s_to_hours_days(durations.min())[0]
+        row["max_hours"] = s_to_hours_days(durations.max())[0]
+        summary_rows.append(row)
 
     summary_fields = [
         "project_id",
         "project_path_with_namespace",
         "count",
         "avg_hours",
-        "p50_hours",
-        "p90_hours",
+        *[f"{quantile_label(q)}_hours" for q in quantiles],
         "min_hours",
         "max_hours",
     ]
@@ -627,7 +3637,9 @@ def main():
         w.writerows(summary_rows)
 
     print(f"[done] Wrote per-project summary to {summary_filename}")
-    print("[stats overall]", summarize_rows(out_rows))
+    if checkpoint is not None:
+        checkpoint.close(remove=True)
+    print("[stats overall]", summarize_durations(overall, quantiles))
 
 
 if __name__ == "__main__":
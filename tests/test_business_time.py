@@ -0,0 +1,170 @@
+"""Compare the calendar-index business-time engine with the original day-by-day loop."""
+import importlib.util
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "review-duration.py")
+spec = importlib.util.spec_from_file_location("review_duration", SCRIPT)
+rd = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rd)
+
+
+def reference_business_seconds(start: datetime, end: datetime) -> float:
+    """The original implementation: Mon–Fri, 09:00–17:00 UTC, one day at a time."""
+    if end <= start:
+        return 0.0
+    start = start.astimezone(timezone.utc)
+    end = end.astimezone(timezone.utc)
+    total = 0.0
+    current_date = start.date()
+    while current_date <= end.date():
+        if current_date.weekday() < 5:
+            day_start = datetime(current_date.year, current_date.month, current_date.day, 9, 0, tzinfo=timezone.utc)
+            day_end = datetime(current_date.year, current_date.month, current_date.day, 17, 0, tzinfo=timezone.utc)
+            interval_start = max(start, day_start)
+            interval_end = min(end, day_end)
+            if interval_end > interval_start:
+                total += (interval_end - interval_start).total_seconds()
+        current_date += timedelta(days=1)
+    return total
+
+
+def random_intervals(seed: int, n: int):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for _ in range(n):
+        start = base + timedelta(seconds=rng.randrange(0, 3 * 365 * 86400), microseconds=rng.randrange(0, 10**6))
+        # Mostly short reviews, some spanning weeks, some ending exactly on the hour
+        length = rng.choice([rng.randrange(0, 4 * 3600), rng.randrange(0, 5 * 86400), rng.randrange(0, 60 * 86400)])
+        end = start + timedelta(seconds=length, microseconds=rng.randrange(-500000, 500000))
+        if rng.random() < 0.1:
+            end = end.replace(minute=0, second=0, microsecond=0)
+        tz = timezone(timedelta(hours=rng.choice([-8, 0, 2, 5.5])))
+        yield start.astimezone(tz), end.astimezone(tz)
+
+
+@pytest.mark.parametrize("start, end, hours", [
+    ("2025-06-06T18:00:00Z", "2025-06-09T10:00:00Z", 1.0),  # Fri 18:00 -> Mon 10:00
+    ("2025-06-07T12:00:00Z", "2025-06-08T13:00:00Z", 0.0),  # Sat -> Sun
+    ("2025-06-10T08:00:00Z", "2025-06-10T11:00:00Z", 2.0),  # Tue 08:00 -> 11:00
+    ("2025-06-11T16:30:00Z", "2025-06-11T18:30:00Z", 0.5),  # Wed 16:30 -> 18:30
+    ("2025-06-11T18:30:00Z", "2025-06-11T16:30:00Z", 0.0),  # end before start
+])
+def test_known_intervals(start, end, hours):
+    assert rd.business_seconds_between(rd.parse_dt(start), rd.parse_dt(end)) == hours * 3600
+
+
+def test_scalar_matches_reference():
+    for start, end in random_intervals(seed=13, n=5000):
+        assert rd.business_seconds_between(start, end) == pytest.approx(
+            reference_business_seconds(start, end), abs=1e-6
+        ), (start, end)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_batch_matches_reference(monkeypatch, use_numpy):
+    if use_numpy and rd.np is None:
+        pytest.skip("numpy not installed")
+    if not use_numpy:
+        monkeypatch.setattr(rd, "np", None)
+    intervals = list(random_intervals(seed=14, n=5000))
+    calendar = rd.BusinessCalendar()
+    raw, business = calendar.durations(
+        [rd.epoch_us(start) for start, _ in intervals],
+        [rd.epoch_us(end) for _, end in intervals],
+    )
+    for (start, end), raw_s, business_s in zip(intervals, raw, business):
+        assert raw_s == pytest.approx((end - start).total_seconds(), abs=1e-6)
+        assert business_s == pytest.approx(reference_business_seconds(start, end), abs=1e-6), (start, end)
+
+
+def reference_calendar_seconds(start: datetime, end: datetime, tz, hours, weekend, holidays) -> float:
+    """Day-by-day loop for any calendar, working hours taken as local wall-clock times."""
+    if end <= start:
+        return 0.0
+    total = 0.0
+    current_date = start.astimezone(tz).date() - timedelta(days=1)
+    while current_date <= end.astimezone(tz).date() + timedelta(days=1):
+        if current_date.weekday() not in weekend and current_date not in holidays:
+            day_start = datetime.combine(current_date, hours[0], tzinfo=tz)
+            day_end = datetime.combine(current_date, hours[1], tzinfo=tz)
+            interval = min(end.timestamp(), day_end.timestamp()) - max(start.timestamp(), day_start.timestamp())
+            if interval > 0:
+                total += interval
+        current_date += timedelta(days=1)
+    return total
+
+
+def dst_intervals(seed: int, n: int):
+    """Intervals clustered around the 2025 DST transitions in Europe and the US."""
+    rng = random.Random(seed)
+    transitions = [
+        datetime(2025, 3, 9, 7, tzinfo=timezone.utc),
+        datetime(2025, 3, 30, 1, tzinfo=timezone.utc),
+        datetime(2025, 10, 26, 1, tzinfo=timezone.utc),
+        datetime(2025, 11, 2, 6, tzinfo=timezone.utc),
+    ]
+    for _ in range(n):
+        start = rng.choice(transitions) + timedelta(seconds=rng.randrange(-10 * 86400, 10 * 86400))
+        end = start + timedelta(seconds=rng.randrange(0, 12 * 86400))
+        yield start, end
+
+
+CALENDARS = [
+    # tz, hours, weekend, holidays
+    ("Europe/Berlin", "08:30-17:30", "sat,sun", ["2025-04-18", "2025-04-21", "2025-10-03", "2025-12-25"]),
+    ("America/New_York", "09:00-17:00", "sat,sun", ["2025-07-04", "2025-11-27", "2025-03-10"]),
+    ("Asia/Kolkata", "10:00-18:30", "sun", ["2025-08-15"]),
+    ("Asia/Dubai", "08:00-16:00", "sat,sun", []),
+    ("Asia/Jerusalem", "09:00-18:00", "fri,sat", ["2025-10-07"]),
+]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+@pytest.mark.parametrize("tz, hours, weekend, holidays", CALENDARS)
+def test_calendar_matches_reference(monkeypatch, use_numpy, tz, hours, weekend, holidays):
+    if use_numpy and rd.np is None:
+        pytest.skip("numpy not installed")
+    if not use_numpy:
+        monkeypatch.setattr(rd, "np", None)
+    holidays = [rd.date.fromisoformat(d) for d in holidays]
+    calendar = rd.BusinessCalendar(tz, hours, weekend, holidays)
+    ref = (calendar.tz, rd.parse_business_hours(hours), set(rd.parse_weekend(weekend)), set(holidays))
+    intervals = list(dst_intervals(seed=15, n=1000)) + list(random_intervals(seed=16, n=1000))
+    _, business = calendar.durations(
+        [rd.epoch_us(start) for start, _ in intervals],
+        [rd.epoch_us(end) for _, end in intervals],
+    )
+    for (start, end), business_s in zip(intervals, business):
+        assert business_s == pytest.approx(reference_calendar_seconds(start, end, *ref), abs=1e-6), (start, end)
+
+
+def test_index_grows_in_both_directions():
+    calendar = rd.BusinessCalendar("America/New_York", "09:00-17:00", "sat,sun", [rd.date(2025, 7, 4)])
+    index_days = calendar.index_days
+    indexed_days = []
+
+    def counting_index_days(first, last):
+        indexed_days.append((last - first).days + 1)
+        return index_days(first, last)
+
+    calendar.index_days = counting_index_days
+    ref = (calendar.tz, rd.parse_business_hours("09:00-17:00"), {5, 6}, {rd.date(2025, 7, 4)})
+    base = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    # Step outwards a few days at a time, as successive merge requests would
+    for i in range(300):
+        for start in (base + timedelta(days=3 * i), base - timedelta(days=3 * i)):
+            end = start + timedelta(days=2, hours=7)
+            _, business = calendar.durations([rd.epoch_us(start)], [rd.epoch_us(end)])
+            assert business[0] == pytest.approx(reference_calendar_seconds(start, end, *ref), abs=1e-6), (start, end)
+    # Growth is geometric and only indexes the missing days
+    indexed = (calendar.last_day - calendar.first_day).days + 1
+    assert len(calendar.day_start) == len(calendar.cumulative) - 1 == indexed
+    assert sum(indexed_days) == indexed
+    assert len(indexed_days) < 20
+    first_day = calendar.first_day
+    calendar.ensure(rd.epoch_us(base), rd.epoch_us(base + timedelta(days=1)))
+    assert calendar.first_day == first_day